@@ -0,0 +1,270 @@
+"""
+Offline benchmarks for the data pipeline, on synthetic readSharedViewData
+payloads of any size.
+
+    python -m layoffs_bench --rows 10000 100000 1000000 --out bench.json
+    python -m layoffs_bench --rows 100000 --baseline bench.json
+
+Each stage is timed separately (best of --repeat) and written as JSON.
+With --baseline, a stage slower than its baseline time by more than
+--tolerance (and by more than --min-seconds) counts as a regression and
+the exit status is 1, so a change can be checked before deploy.
+"""
+import io
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from layoffs_data import table_from_payload, stream_table, _ijson_available
+from layoffs_prep import (
+    PERIOD_COLUMNS,
+    build_dataset,
+    compile_schema,
+    decode_table,
+    period_codes,
+    row_hashes,
+)
+from layoffs_index import AggregateCube, InvertedIndex, SortIndex
+from layoffs_geo import DEFAULT_GEOJSON_URL, load_geo_index
+
+DEFAULT_ROWS = (10_000, 100_000)
+DEFAULT_TOLERANCE = 1.25
+DEFAULT_MIN_SECONDS = 0.005
+
+_LOCATIONS = [
+    "SF Bay Area", "New York City", "Seattle", "Boston", "Los Angeles", "Austin", "Chicago", "London",
+    "Berlin", "Bengaluru", "Toronto", "Tel Aviv", "Singapore", "Sao Paulo", "Non-U.S.", "Paris",
+]
+_INDUSTRIES = [
+    "Retail", "Finance", "Other", "Crypto", "Healthcare", "Transportation", "Food", "Media", "Security",
+    "Sales", "Consumer", "Real Estate", "Marketing", "Education", "Travel", "Infrastructure", "HR", "Data",
+]
+_COUNTRIES = [
+    "United States", "India", "United Kingdom", "Germany", "Canada", "Israel", "Brazil", "Singapore",
+    "France", "Australia", "Netherlands", "Sweden", "China", "Indonesia", "Nigeria", "Spain",
+]
+_STAGES = ["Post-IPO", "Seed", "Series A", "Series B", "Series C", "Series D", "Acquired", "Private Equity", "Unknown"]
+
+
+def _choices(prefix: str, names: List[str]) -> Dict[str, dict]:
+    return {f"{prefix}{i:03d}": {"id": f"{prefix}{i:03d}", "name": name} for i, name in enumerate(names)}
+
+
+def generate_payload(n_rows: int, seed: int = 0, n_companies: Optional[int] = None) -> dict:
+    """
+    A readSharedViewData response shaped like the layoffs.fyi table: a
+    columns schema with typeOptions.choices for Location HQ (multi-select),
+    Industry, Country and Stage, and `n_rows` rows with skewed choice
+    frequencies, repeated companies and missing measures.
+    """
+    rng = np.random.default_rng(seed)
+    n_companies = n_companies or max(1, n_rows // 3)
+
+    locations = _choices("sel", _LOCATIONS)
+    industries = _choices("selI", _INDUSTRIES)
+    countries = _choices("selC", _COUNTRIES)
+    stages = _choices("selS", _STAGES)
+    columns = [
+        {"id": "fldCompany", "name": "Company", "type": "text"},
+        {"id": "fldLocation", "name": "Location HQ", "type": "multiSelect", "typeOptions": {"choices": locations}},
+        {"id": "fldLaidOff", "name": "# Laid Off", "type": "number"},
+        {"id": "fldDate", "name": "Date", "type": "date"},
+        {"id": "fldPercent", "name": "%", "type": "percentV2"},
+        {"id": "fldIndustry", "name": "Industry", "type": "select", "typeOptions": {"choices": industries}},
+        {"id": "fldSource", "name": "Source", "type": "text"},
+        {"id": "fldStage", "name": "Stage", "type": "select", "typeOptions": {"choices": stages}},
+        {"id": "fldFunds", "name": "$ Raised (mm)", "type": "number"},
+        {"id": "fldCountry", "name": "Country", "type": "select", "typeOptions": {"choices": countries}},
+        {"id": "fldDateAdded", "name": "Date Added", "type": "dateTime"},
+    ]
+
+    def skewed(ids: List[str], size: int) -> np.ndarray:
+        weights = 1.0 / np.arange(1, len(ids) + 1)
+        return rng.choice(np.array(ids, dtype=object), size=size, p=weights / weights.sum())
+
+    location_ids, industry_ids = list(locations), list(industries)
+    country_ids, stage_ids = list(countries), list(stages)
+    company = rng.zipf(1.3, n_rows) % n_companies
+    loc_first = skewed(location_ids, n_rows)
+    loc_second = skewed(location_ids, n_rows)
+    has_second = rng.random(n_rows) < 0.1
+    industry = skewed(industry_ids, n_rows)
+    country = skewed(country_ids, n_rows)
+    stage = skewed(stage_ids, n_rows)
+    day = np.datetime64("2020-03-01") + rng.integers(0, 5 * 365, n_rows)
+    added_lag = rng.integers(0, 30, n_rows)
+    laid_off = np.round(rng.lognormal(4.5, 1.3, n_rows)).astype(int)
+    has_laid_off = rng.random(n_rows) < 0.7
+    percent = rng.choice([0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0], n_rows)
+    has_percent = rng.random(n_rows) < 0.6
+    funds = np.round(rng.lognormal(4, 2, n_rows), 1)
+
+    rows = []
+    for i in range(n_rows):
+        cells = {
+            "fldCompany": f"Company {company[i]}",
+            "fldLocation": [loc_first[i], loc_second[i]] if has_second[i] else [loc_first[i]],
+            "fldDate": f"{day[i]}T00:00:00.000Z",
+            "fldIndustry": industry[i],
+            "fldSource": f"https://example.com/news/{i}",
+            "fldStage": stage[i],
+            "fldFunds": float(funds[i]),
+            "fldCountry": country[i],
+            "fldDateAdded": f"{day[i] + added_lag[i]}T12:00:00.000Z",
+        }
+        if has_laid_off[i]:
+            cells["fldLaidOff"] = int(laid_off[i])
+        if has_percent[i]:
+            cells["fldPercent"] = float(percent[i])
+        rows.append({"id": f"rec{i:012d}", "createdTime": cells["fldDateAdded"], "cellValuesByColumnId": cells})
+
+    return {"msg": "SUCCESS", "data": {"table": {"columns": columns, "rows": rows}}}
+
+
+def _best_of(fn: Callable[[], Any], repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _figure_json(fig) -> str:
+    return pio.to_json(fig, validate=False)
+
+
+def run_benchmark(n_rows: int, repeat: int = 3, seed: int = 0, log: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """
+    Seconds per pipeline stage for one synthetic payload of `n_rows` rows.
+    """
+    timings: Dict[str, float] = {}
+
+    def stage(name: str, fn: Callable[[], Any]):
+        timings[name], result = _best_of(fn, repeat)
+        if log:
+            log(f"  {name:<24} {timings[name]:9.4f}s")
+        return result
+
+    payload = generate_payload(n_rows, seed=seed)
+    raw = json.dumps(payload).encode("utf-8")
+    timings["payload_mb"] = len(raw) / 1e6
+    del payload
+
+    payload = stage("json_decode", lambda: json.loads(raw))
+    table = stage("table_from_payload", lambda: table_from_payload(payload))
+    if _ijson_available():
+        stage("stream_table", lambda: stream_table(io.BytesIO(raw)))
+    del payload
+
+    schema = stage("compile_schema", lambda: compile_schema(table.columns))
+    decoded = stage("decode_table", lambda: decode_table(table, schema))
+    dates = stage("parse_dates", lambda: pd.to_datetime(decoded["Date"]))
+    for col, freq in PERIOD_COLUMNS.items():
+        stage(f"period_codes_{col.lower()}", lambda: period_codes(dates, freq))
+    stage("row_hashes", lambda: row_hashes(table))
+    data = stage("build_dataset", lambda: build_dataset(table))
+
+    cube = stage("cube_build", lambda: AggregateCube.from_frame(data))
+    rollups = {}
+    for dim in ("Year", "Quarter", "Month", "Industry", "Stage", "City"):
+        rollups[dim] = stage(f"rollup_{dim.lower()}", lambda: cube.rollup(dim))
+    rollups["Country"] = stage("rollup_country_distinct", lambda: cube.rollup("Country", distinct=True))
+    stage("cube_slice", lambda: cube.slice(industry=_INDUSTRIES[0], country="United States of America"))
+
+    row_index = stage("index_build", lambda: InvertedIndex.from_frame(data))
+    stage("index_select", lambda: row_index.select({"Industry": _INDUSTRIES[0], "Country": "India"}))
+    stage("index_counts", lambda: row_index.counts("Company"))
+
+    sort_index = stage("sort_index_build", lambda: SortIndex.from_frame(data))
+    selected = row_index.select({"Industry": _INDUSTRIES[0]})
+    stage("sort_page", lambda: sort_index.order("# Laid Off", selected, ascending=False)[:50])
+    stage("top_rows", lambda: sort_index.top("# Laid Off", 10, require=("Day", "Company")))
+    stage("top_rows_selected", lambda: sort_index.top("# Laid Off", 10, selected, require=("Day", "Company")))
+
+    geo_index = load_geo_index()
+    country = rollups["Country"].assign(id=lambda d: d["Country"].astype(str).map(geo_index)).dropna(subset=["id"])
+    country["# Laid Off"] = country["# Laid Off"].astype(float)
+    month = rollups["Month"].assign(**{"# Laid Off": lambda d: d["# Laid Off"].astype(float)})
+    stage("figure_bar_json", lambda: _figure_json(px.bar(month, x="Month", y="# Laid Off")))
+    stage("figure_map_json", lambda: _figure_json(
+        px.choropleth(country, geojson=DEFAULT_GEOJSON_URL, locations="id", color="# Laid Off")
+    ))
+
+    return timings
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float = DEFAULT_TOLERANCE, min_seconds: float = DEFAULT_MIN_SECONDS) -> List[str]:
+    """
+    Regressions of `results` against `baseline` (both {rows: {stage: s}}),
+    as readable lines. Stages or sizes missing from either side are skipped.
+    """
+    regressions = []
+    for rows, stages in results.items():
+        base = baseline.get(rows, {})
+        for name, seconds in stages.items():
+            if name.endswith("_mb") or name not in base:
+                continue
+            limit = base[name] * tolerance
+            if seconds > limit and seconds - base[name] > min_seconds:
+                regressions.append(f"{rows} rows {name}: {seconds:.4f}s > {limit:.4f}s ({base[name]:.4f}s x {tolerance})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m layoffs_bench", description="Benchmark the data pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--baseline", help="results JSON to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for n_rows in args.rows:
+        print(f"{n_rows:,} rows")
+        results[str(n_rows)] = run_benchmark(n_rows, repeat=args.repeat, seed=args.seed, log=print)
+
+    report = {
+        "meta": {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, tolerance=args.tolerance, min_seconds=args.min_seconds)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
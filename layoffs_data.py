@@ -1,14 +1,24 @@
 import os
+import re
 import json
+import time
 import urllib.parse
 import asyncio
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Callable, List, Optional, Tuple
+import atexit
+import shutil
+import hashlib
+import argparse
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
 from playwright.async_api import async_playwright
 
+from layoffs_trace import annotate, count, span
+
 
 DEFAULT_UA = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -34,9 +44,21 @@ def _requests_headers(user_agent: str) -> dict:
             'x-requested-with': 'XMLHttpRequest',
             'x-time-zone': 'America/Chicago',
             'x-user-locale': 'en',
+            'accept-encoding': _accept_encoding(),
            }
 
 
+def _accept_encoding() -> str:
+    # urllib3 only decodes br when a brotli package is installed
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            pass
+    return "gzip, deflate"
+
+
 def _parse_access_policy_expiry(read_url: str) -> Optional[datetime]:
     parsed = urllib.parse.urlparse(read_url)
     qs = urllib.parse.parse_qs(parsed.query)
@@ -78,39 +100,227 @@ def _extract_view_and_share(read_url: str) -> Tuple[Optional[str], Optional[str]
 
 
 def _is_preferred_variant(u: str) -> bool:
-    # Prefer nested response format and avoid msgpack toggle variant
+    # Prefer nested response format and avoid msgpack toggle variant;
+    # fetch_json(msgpack=True) uses the captured msgpack variant, if any
     return ("shouldUseNestedResponseFormat%22%3Atrue" in u) and ("allowMsgpackOfResult" not in u)
 
 
+async def _launch_chromium(p):
+    #browser = await p.chromium.launch(headless=True)
+    return await p.chromium.launch(
+                    headless=True,
+                    executable_path="/usr/bin/chromium",
+                    args=["--no-sandbox", "--disable-dev-shm-usage"],
+                )
+
+
+class BrowserPool:
+    """
+    Keeps one Chromium process alive across discoveries and hands out a fresh
+    context per call. Playwright lives on a private event loop thread, so the
+    pool can be shared by sync callers that would otherwise asyncio.run() a new
+    loop each time. The browser is relaunched after `max_uses` contexts or when
+    it has disconnected (crash), and closed on process exit.
+    """
+
+    def __init__(self, max_uses: int = 50):
+        self.max_uses = max_uses
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+        self._active = 0
+        atexit.register(self.close)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="layoffs-browser-pool", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def owns_running_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro):
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def run_async(self, coro):
+        loop = self._ensure_loop()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _close_browser(self):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _acquire_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+
+        async with self._browser_lock:
+            stale = self._browser is not None and (
+                not self._browser.is_connected()
+                or (self._uses >= self.max_uses and self._active == 0)
+            )
+            if stale:
+                await self._close_browser()
+
+            if self._browser is None:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await _launch_chromium(self._playwright)
+                self._uses = 0
+
+            self._uses += 1
+            self._active += 1
+            return self._browser
+
+    @asynccontextmanager
+    async def context(self, user_agent: str = DEFAULT_UA):
+        browser = await self._acquire_browser()
+        acquired = True
+        try:
+            try:
+                context = await browser.new_context(user_agent=user_agent)
+            except Exception:
+                # Browser died between acquire and use: relaunch once
+                self._active -= 1
+                acquired = False
+                await self._close_browser()
+                browser = await self._acquire_browser()
+                acquired = True
+                context = await browser.new_context(user_agent=user_agent)
+
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        finally:
+            # Only release what was acquired: a failed relaunch already did
+            if acquired:
+                self._active -= 1
+
+    async def _aclose(self):
+        await self._close_browser()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def close(self):
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._aclose(), loop).result(timeout=30)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+_browser_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> Optional[BrowserPool]:
+    """
+    Process-wide pool, only when LAYOFFS_BROWSER_POOL is enabled.
+    LAYOFFS_BROWSER_POOL_MAX_USES sets how often the browser is recycled.
+    """
+    global _browser_pool
+
+    if not _setting_enabled("LAYOFFS_BROWSER_POOL"):
+        return None
+
+    if _browser_pool is None:
+        try:
+            max_uses = int(_load_setting("LAYOFFS_BROWSER_POOL_MAX_USES", "50"))
+        except ValueError:
+            max_uses = 50
+        _browser_pool = BrowserPool(max_uses=max_uses)
+    return _browser_pool
+
+
 # +
-async def discover_all_and_pick_readsharedviewdata_url_async(
+@dataclass
+class DiscoveryResult:
+    """
+    Outcome of one page load for several targets: the picked URL and all
+    matching URLs per found target, an error per target that was not found.
+    """
+    picked: Dict[Target, str] = field(default_factory=dict)
+    matches: Dict[Target, List[str]] = field(default_factory=dict)
+    errors: Dict[Target, str] = field(default_factory=dict)
+    all_urls: List[str] = field(default_factory=list)
+
+
+async def discover_targets_async(
     page_url: str,
-    target: Target,
+    targets: List[Target],
     user_agent: str = DEFAULT_UA,
     timeout_ms: int = 120_000,
     settle_ms: int = 12_000,
     log: Optional[Callable[[str], None]] = None,
-) -> Tuple[str, List[str], List[str]]:
+    grace_ms: int = 0,
+    pool: Optional[BrowserPool] = None,
+) -> DiscoveryResult:
     """
-    Returns (picked_url, all_unique_urls, matching_urls).
+    Captures the readSharedViewData URLs of every target in one page load.
+
+    Resolves as soon as a preferred-variant URL has been captured for every
+    target; `settle_ms` is only the upper bound on waiting after
+    domcontentloaded. `grace_ms` keeps listening a little longer to collect
+    other variants. With a `pool`, the page is opened in a fresh context of
+    its warm browser. Never raises for a single target: a failed page load
+    or a target that never showed up ends up in `errors`.
     """
-    found: List[str] = []
+    targets = list(dict.fromkeys(targets))
+    result = DiscoveryResult(matches={t: [] for t in targets})
+    by_ids = {(t.view_id, t.share_id): t for t in targets}
     seen = set()
-    matches: List[str] = []
+    preferred_seen = {t: asyncio.Event() for t in targets}
 
     def _log(msg: str):
         if log:
             log(msg)
 
-    async with async_playwright() as p:
-        #browser = await p.chromium.launch(headless=True)
-        browser = await p.chromium.launch(
-                        headless=True,
-                        executable_path="/usr/bin/chromium",
-                        args=["--no-sandbox", "--disable-dev-shm-usage"],
-                    )
-        context = await browser.new_context(user_agent=user_agent)
+    if pool is not None and not pool.owns_running_loop():
+        # Playwright objects are bound to the pool's loop, so run there
+        return await pool.run_async(
+            discover_targets_async(
+                page_url=page_url,
+                targets=targets,
+                user_agent=user_agent,
+                timeout_ms=timeout_ms,
+                settle_ms=settle_ms,
+                log=log,
+                grace_ms=grace_ms,
+                pool=pool,
+            )
+        )
 
+    async def capture(context):
         # Speed: block heavy assets
         async def route_handler(route):
             if route.request.resource_type in {"image", "media", "font", "stylesheet"}:
@@ -128,45 +338,92 @@ async def discover_all_and_pick_readsharedviewdata_url_async(
                 if u in seen:
                     return
                 seen.add(u)
-                found.append(u)
-
-                view_id, share_id = _extract_view_and_share(u)
-                expiry = _parse_access_policy_expiry(u)
+                result.all_urls.append(u)
 
-                is_target = (view_id == target.view_id) and (share_id == target.share_id)
-                if is_target:
-                    matches.append(u)
+                target = by_ids.get(_extract_view_and_share(u))
+                if target is not None:
+                    result.matches[target].append(u)
+                    if _is_preferred_variant(u):
+                        preferred_seen[target].set()
 
-#                 _log(
-#                     f"Found readSharedViewData{' (TARGET)' if is_target else ''}\n"
-#                     f"  viewId={view_id} shareId={share_id}\n"
-#                     f"  expires={expiry}\n"
-#                     f"  url={u}"
-#                 )
+                _log(f"Found readSharedViewData{' (TARGET)' if target else ''}: {read_url_summary(u)}")
 
         page.on("request", on_request)
 
         await page.goto(page_url, wait_until="domcontentloaded", timeout=timeout_ms)
-        await page.wait_for_timeout(settle_ms)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(event.wait() for event in preferred_seen.values())),
+                timeout=settle_ms / 1000,
+            )
+            if grace_ms:
+                await page.wait_for_timeout(grace_ms)
+        except asyncio.TimeoutError:
+            pass
 
-        await context.close()
-        await browser.close()
+    page_error = None
+    try:
+        if pool is not None:
+            async with pool.context(user_agent=user_agent) as context:
+                await capture(context)
+        else:
+            async with async_playwright() as p:
+                browser = await _launch_chromium(p)
+                context = await browser.new_context(user_agent=user_agent)
+                await capture(context)
 
-    if not found:
-        raise RuntimeError(
-            "No readSharedViewData requests captured. The page may have changed, "
-            "loaded too slowly, or blocked headless."
-        )
+                await context.close()
+                await browser.close()
+    except Exception as e:
+        page_error = f"Page load failed: {type(e).__name__}: {e}"
 
-    if not matches:
-        raise RuntimeError(
-            f"Captured {len(found)} readSharedViewData URLs but none matched "
-            f"view_id={target.view_id} share_id={target.share_id}."
-        )
+    for target in targets:
+        matches = result.matches[target]
+        if matches:
+            matches.sort(key=lambda u: (0 if _is_preferred_variant(u) else 1, len(u)))
+            result.picked[target] = matches[0]
+        elif page_error:
+            result.errors[target] = page_error
+        elif not result.all_urls:
+            result.errors[target] = (
+                "No readSharedViewData requests captured. The page may have changed, "
+                "loaded too slowly, or blocked headless."
+            )
+        else:
+            result.errors[target] = (
+                f"Captured {len(result.all_urls)} readSharedViewData URLs but none matched "
+                f"view_id={target.view_id} share_id={target.share_id}."
+            )
+    return result
 
-    matches.sort(key=lambda u: (0 if _is_preferred_variant(u) else 1, len(u)))
-    picked = matches[0]
-    return picked, found, matches
+
+async def discover_all_and_pick_readsharedviewdata_url_async(
+    page_url: str,
+    target: Target,
+    user_agent: str = DEFAULT_UA,
+    timeout_ms: int = 120_000,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    grace_ms: int = 0,
+    pool: Optional[BrowserPool] = None,
+) -> Tuple[str, List[str], List[str]]:
+    """
+    Returns (picked_url, all_unique_urls, matching_urls) for one target;
+    see discover_targets_async. Raises RuntimeError if it was not found.
+    """
+    result = await discover_targets_async(
+        page_url=page_url,
+        targets=[target],
+        user_agent=user_agent,
+        timeout_ms=timeout_ms,
+        settle_ms=settle_ms,
+        log=log,
+        grace_ms=grace_ms,
+        pool=pool,
+    )
+    if target in result.errors:
+        raise RuntimeError(result.errors[target])
+    return result.picked[target], result.all_urls, result.matches[target]
 
 
 # -
@@ -178,11 +435,28 @@ def discover_picked_url(
     timeout_ms: int = 120_000,
     settle_ms: int = 12_000,
     log: Optional[Callable[[str], None]] = None,
+    grace_ms: int = 0,
+    pool: Optional[BrowserPool] = None,
 ) -> Tuple[str, List[str], List[str]]:
     """
     Sync wrapper for Streamlit / normal scripts.
     NOTE: In Jupyter, call the async function with `await` instead.
     """
+    if pool is not None:
+        # The pool runs its own loop thread, so this works from any caller
+        return pool.run(
+            discover_all_and_pick_readsharedviewdata_url_async(
+                page_url=page_url,
+                target=target,
+                user_agent=user_agent,
+                timeout_ms=timeout_ms,
+                settle_ms=settle_ms,
+                log=log,
+                grace_ms=grace_ms,
+                pool=pool,
+            )
+        )
+
     try:
         loop = asyncio.get_running_loop()
         if loop.is_running():
@@ -202,16 +476,394 @@ def discover_picked_url(
             timeout_ms=timeout_ms,
             settle_ms=settle_ms,
             log=log,
+            grace_ms=grace_ms,
         )
     )
 
 
-def fetch_json(read_url: str, user_agent: str = DEFAULT_UA, timeout: int = 90) -> dict:
-    r = requests.get(read_url, headers=_requests_headers(user_agent), timeout=timeout)
+def discover_targets(
+    page_url: str,
+    targets: List[Target],
+    user_agent: str = DEFAULT_UA,
+    timeout_ms: int = 120_000,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    grace_ms: int = 0,
+    pool: Optional[BrowserPool] = None,
+) -> DiscoveryResult:
+    """
+    Sync wrapper of discover_targets_async, like discover_picked_url.
+    """
+    coro = discover_targets_async(
+        page_url=page_url,
+        targets=targets,
+        user_agent=user_agent,
+        timeout_ms=timeout_ms,
+        settle_ms=settle_ms,
+        log=log,
+        grace_ms=grace_ms,
+        pool=pool,
+    )
+    if pool is not None:
+        return pool.run(coro)
+    return asyncio.run(coro)
+
+
+# Msgpack variants the page itself requested, by the read URL picked with them
+_msgpack_urls: Dict[str, str] = {}
+
+
+def _captured_msgpack_variant(read_url: str, matches: List[str]) -> Optional[str]:
+    # Same nested response format, and signed for at least as long as read_url
+    expiry = _parse_access_policy_expiry(read_url)
+    for u in matches:
+        if "allowMsgpackOfResult=true" in u and "shouldUseNestedResponseFormat%22%3Atrue" in u:
+            u_expiry = _parse_access_policy_expiry(u)
+            if expiry is not None and u_expiry is not None and u_expiry >= expiry:
+                return u
+    return None
+
+
+def _msgpack_variant(read_url: str) -> str:
+    # The captured variant if discovery saw one; otherwise the same signed URL
+    # with the msgpack toggle switched on
+    captured = _msgpack_urls.get(read_url)
+    if captured:
+        return captured
+    if "allowMsgpackOfResult=" in read_url:
+        return re.sub(r"allowMsgpackOfResult=[^&]*", "allowMsgpackOfResult=true", read_url)
+    return read_url + ("&" if "?" in read_url else "?") + "allowMsgpackOfResult=true"
+
+
+def _msgpack_available() -> bool:
+    try:
+        import msgpack  # type: ignore  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _decode_msgpack(body: bytes) -> dict:
+    import msgpack  # type: ignore
+    return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+
+# ## HTTP session and conditional requests
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide Session: pooled keep-alive connections, and GETs retried
+    with exponential backoff on connection errors, 429 and 5xx.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+                raise_on_status=False,
+                respect_retry_after_header=True,
+            )
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+class NotModified(Exception):
+    """
+    The payload is the one described by the Validators passed in: the server
+    answered 304, or the body hashed to the same content hash.
+    """
+
+
+@dataclass
+class Validators:
+    """
+    What is known about the last fetched payload. Sent as If-None-Match /
+    If-Modified-Since, and updated in place from each successful response.
+    Signed read URLs change on every discovery, so these are kept per
+    target (in the snapshot meta), not per URL.
+    """
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> "Validators":
+        return cls(
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            content_hash=meta.get("content_hash"),
+        )
+
+    def as_meta(self) -> Dict[str, Any]:
+        return {"etag": self.etag, "last_modified": self.last_modified, "content_hash": self.content_hash}
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["if-none-match"] = self.etag
+        if self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        return headers
+
+    def check_response(self, r: requests.Response) -> None:
+        if r.status_code == 304:
+            raise NotModified(read_url_summary(r.url))
+        self.etag = r.headers.get("etag") or None
+        self.last_modified = r.headers.get("last-modified") or None
+
+    def check_content(self, content_hash: str, url: str) -> None:
+        previous, self.content_hash = self.content_hash, content_hash
+        if previous == content_hash:
+            raise NotModified(read_url_summary(url))
+
+
+def read_url_summary(read_url: str) -> str:
+    # Signed URLs are long and carry the access policy; logs only need the path
+    return urllib.parse.urlparse(read_url).path
+
+
+def _content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class _HashingReader:
+    # File-like wrapper that hashes everything read through it
+    def __init__(self, raw):
+        self.raw = raw
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self.raw.read(n)
+        self.hash.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        # Whatever the parser left unread still counts towards the hash
+        while self.read(64 * 1024):
+            pass
+        return self.hash.hexdigest()
+
+
+def _get(url: str, user_agent: str, timeout: int, validators: Optional["Validators"], **kwargs) -> requests.Response:
+    headers = _requests_headers(user_agent)
+    if validators is not None:
+        headers.update(validators.request_headers())
+    return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+def fetch_json(
+    read_url: str,
+    user_agent: str = DEFAULT_UA,
+    timeout: int = 90,
+    msgpack: bool = False,
+    validators: Optional[Validators] = None,
+) -> dict:
+    """
+    With `msgpack=True` the msgpack variant of `read_url` is requested and the
+    binary body decoded into the same nested structure. Falls back to the
+    JSON URL if msgpack is not installed, the variant is refused or the body
+    does not decode.
+
+    With `validators`, raises NotModified for a payload that did not change
+    (without decoding it when the server answers 304), and records the new
+    validators otherwise. A 401/403 is raised as is, so the caller can
+    rediscover the read URL instead of retrying it as JSON.
+    """
+    if msgpack and _msgpack_available():
+        try:
+            r = _get(_msgpack_variant(read_url), user_agent, timeout, validators)
+            if r.status_code in (401, 403):
+                r.raise_for_status()
+            if r.ok:
+                if validators is not None:
+                    validators.check_response(r)
+                if "msgpack" in r.headers.get("content-type", ""):
+                    data = _decode_msgpack(r.content)
+                else:
+                    data = r.json()
+                # Only a body that decoded counts as the last fetched payload
+                if validators is not None:
+                    validators.check_content(_content_hash(r.content), read_url)
+                annotate(bytes=len(r.content), format="msgpack")
+                return data
+        except (ValueError, TypeError):
+            pass
+
+    r = _get(read_url, user_agent, timeout, validators)
     r.raise_for_status()
+    if validators is not None:
+        validators.check_response(r)
+        validators.check_content(_content_hash(r.content), read_url)
+    annotate(bytes=len(r.content), format="json")
     return r.json()
 
 
+def _setting_enabled(name: str) -> bool:
+    return _load_setting(name).lower() in {"1", "true", "yes", "on"}
+
+
+# ## Column-wise table decoding
+
+@dataclass
+class TableColumns:
+    """
+    readSharedViewData table held column-wise: `values` maps column id to the
+    cell values of every row, aligned with `ids`. Missing cells are None.
+    """
+    columns: List[dict]
+    values: Dict[str, list]
+    ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _append_row(values: Dict[str, list], ids: List[str], row: dict) -> None:
+    n = len(ids)
+    for col, v in (row.get("cellValuesByColumnId") or {}).items():
+        buf = values.get(col)
+        if buf is None:
+            buf = values[col] = [None] * n
+        elif len(buf) < n:
+            buf.extend([None] * (n - len(buf)))
+        buf.append(v)
+    ids.append(row.get("id"))
+
+
+def _pad_columns(values: Dict[str, list], n: int) -> None:
+    for buf in values.values():
+        if len(buf) < n:
+            buf.extend([None] * (n - len(buf)))
+
+
+def table_from_payload(json_data: dict) -> TableColumns:
+    table = json_data["data"]["table"]
+    values: Dict[str, list] = {}
+    ids: List[str] = []
+    for row in table["rows"]:
+        _append_row(values, ids, row)
+    _pad_columns(values, len(ids))
+    return TableColumns(columns=table["columns"], values=values, ids=ids)
+
+
+def _ijson_available() -> bool:
+    try:
+        import ijson  # type: ignore  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _iter_prefixed_items(events, prefixes):
+    """
+    Yields (prefix, item) for every complete value found under one of
+    `prefixes` in an ijson event stream, building one item at a time.
+    """
+    import ijson  # type: ignore
+
+    for current, event, value in events:
+        if current not in prefixes:
+            continue
+        if event not in ("start_map", "start_array"):
+            yield current, value
+            continue
+
+        top = current
+        builder = ijson.ObjectBuilder()
+        depth = 1
+        builder.event(event, value)
+        while depth:
+            current, event, value = next(events)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+            builder.event(event, value)
+        yield top, builder.value
+
+
+def stream_table(fp) -> TableColumns:
+    """
+    Decodes data.table from a file-like JSON body row by row, appending each
+    row straight into the column buffers so the full payload dict is never
+    materialised.
+    """
+    import ijson  # type: ignore
+
+    columns: List[dict] = []
+    values: Dict[str, list] = {}
+    ids: List[str] = []
+
+    events = iter(ijson.parse(fp, use_float=True))
+    prefixes = {"data.table.columns.item", "data.table.rows.item"}
+    for prefix, item in _iter_prefixed_items(events, prefixes):
+        if prefix == "data.table.rows.item":
+            _append_row(values, ids, item)
+        else:
+            columns.append(item)
+
+    _pad_columns(values, len(ids))
+    return TableColumns(columns=columns, values=values, ids=ids)
+
+
+def fetch_table(
+    read_url: str,
+    user_agent: str = DEFAULT_UA,
+    timeout: int = 90,
+    msgpack: bool = False,
+    validators: Optional[Validators] = None,
+) -> TableColumns:
+    """
+    Like fetch_json, but returns the table column-wise. JSON bodies are
+    streamed when ijson is installed, and hashed as they stream, so the
+    whole body is never held in memory; otherwise it is decoded whole.
+    """
+    if msgpack or not _ijson_available():
+        return table_from_payload(
+            fetch_json(read_url, user_agent=user_agent, timeout=timeout, msgpack=msgpack, validators=validators)
+        )
+
+    with _get(read_url, user_agent, timeout, validators, stream=True) as r:
+        r.raise_for_status()
+        if validators is not None:
+            validators.check_response(r)
+        r.raw.decode_content = True
+        reader = _HashingReader(r.raw)
+        table = stream_table(reader)
+        content_hash = reader.hexdigest()
+        annotate(bytes=r.raw.tell(), format="json-stream")
+
+    if validators is not None:
+        validators.check_content(content_hash, read_url)
+    return table
+
+
+def table_to_frame(table: TableColumns):
+    """
+    DataFrame with one column per schema column (by name) plus `id`.
+    """
+    import pandas as pd
+
+    names = {c["id"]: c["name"] for c in table.columns}
+    data = {names.get(col, col): buf for col, buf in table.values.items()}
+    data["id"] = table.ids
+    return pd.DataFrame(data)
+
+
 def _maybe_load_dotenv():
     """
     For local dev only. Streamlit Cloud won't have python-dotenv unless you add it.
@@ -246,16 +898,1157 @@ def load_target() -> Target:
     return Target(view_id=view_id, share_id=share_id)
 
 
-def load_page_url(default: str = "https://layoffs.fyi") -> str:
+def load_targets() -> List[Target]:
+    """
+    Every target to acquire: AIRTABLE_TARGETS as "view_id/share_id,..."
+    when set, otherwise just load_target().
+    """
+    raw = _load_setting("AIRTABLE_TARGETS")
+    if not raw:
+        return [load_target()]
+    targets = []
+    for item in raw.split(","):
+        view_id, _, share_id = item.strip().partition("/")
+        if not view_id or not share_id:
+            raise RuntimeError(f"Bad AIRTABLE_TARGETS entry {item!r}; expected view_id/share_id.")
+        targets.append(Target(view_id=view_id, share_id=share_id))
+    return targets
+
+
+def _load_setting(name: str, default: str = "") -> str:
+    """
+    Streamlit secrets first, then env vars, then `default`.
+    """
     _maybe_load_dotenv()
 
     try:
         import streamlit as st
-        v = str(st.secrets.get("PAGE_URL", "")).strip()
-        if v:
-            return v
+        # load_if_toml_exists avoids an st.error box per setting when there is no secrets file
+        if st.secrets.load_if_toml_exists():
+            v = str(st.secrets.get(name, "")).strip()
+            if v:
+                return v
     except Exception:
         pass
 
-    v = os.getenv("PAGE_URL", "").strip()
+    v = os.getenv(name, "").strip()
     return v if v else default
+
+
+def load_page_url(default: str = "https://layoffs.fyi") -> str:
+    return _load_setting("PAGE_URL", default)
+
+
+def load_geojson_url(default: str = "app/static/world.min.geojson") -> str:
+    # Where the browser fetches the choropleth geometry (see layoffs_geo)
+    return _load_setting("GEOJSON_URL", default)
+
+
+def load_log_level(default: str = "INFO") -> str:
+    return _load_setting("LAYOFFS_LOG_LEVEL", default)
+
+
+def load_admin_token() -> str:
+    """
+    Secret that unlocks the dashboard's diagnostics panel (?admin=<token>);
+    the panel is off when it is empty.
+    """
+    return _load_setting("LAYOFFS_ADMIN_TOKEN")
+
+
+# ## readSharedViewData URL cache
+
+DEFAULT_URL_CACHE_PATH = os.path.join(".cache", "layoffs_read_urls.json")
+DEFAULT_URL_EXPIRY_MARGIN_S = 10 * 60
+
+_url_cache: Dict[Target, Tuple[str, datetime]] = {}
+_url_cache_lock = threading.Lock()
+
+
+def _target_key(target: Target) -> str:
+    return f"{target.view_id}/{target.share_id}"
+
+
+def _atomic_write_json(path: str, obj: Any) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _read_url_cache_file(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def load_url_cache_path(default: str = DEFAULT_URL_CACHE_PATH) -> str:
+    return _load_setting("LAYOFFS_URL_CACHE_PATH", default)
+
+
+def cache_read_url(
+    target: Target,
+    read_url: str,
+    path: Optional[str] = None,
+    matches: Optional[List[str]] = None,
+) -> None:
+    """
+    Remembers `read_url` for `target` until its accessPolicy expires.
+    URLs without a parseable expiry are not cached. `matches` are all the
+    URLs discovery captured for `target`; the msgpack variant among them is
+    kept in memory for fetch_json(msgpack=True).
+    """
+    expiry = _parse_access_policy_expiry(read_url)
+    if expiry is None:
+        return
+
+    path = path or load_url_cache_path()
+    msgpack_url = _captured_msgpack_variant(read_url, matches or [])
+    with _url_cache_lock:
+        previous = _url_cache.get(target)
+        if previous is not None:
+            _msgpack_urls.pop(previous[0], None)
+        if msgpack_url:
+            _msgpack_urls[read_url] = msgpack_url
+        _url_cache[target] = (read_url, expiry)
+        stored = _read_url_cache_file(path)
+        stored[_target_key(target)] = read_url
+        try:
+            _atomic_write_json(path, stored)
+        except OSError:
+            pass
+
+
+def invalidate_read_url(target: Target, path: Optional[str] = None) -> None:
+    path = path or load_url_cache_path()
+    with _url_cache_lock:
+        previous = _url_cache.pop(target, None)
+        if previous is not None:
+            _msgpack_urls.pop(previous[0], None)
+        stored = _read_url_cache_file(path)
+        if stored.pop(_target_key(target), None) is not None:
+            try:
+                _atomic_write_json(path, stored)
+            except OSError:
+                pass
+
+
+def cached_read_url(
+    target: Target,
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    path: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Returns the cached URL for `target` if it is still valid for at least
+    `margin_s` seconds, checking memory first and then the on-disk file.
+    """
+    path = path or load_url_cache_path()
+    with _url_cache_lock:
+        entry = _url_cache.get(target)
+        if entry is None:
+            read_url = _read_url_cache_file(path).get(_target_key(target))
+            expiry = _parse_access_policy_expiry(read_url) if read_url else None
+            if expiry is None:
+                return None
+            entry = _url_cache[target] = (read_url, expiry)
+
+    read_url, expiry = entry
+    remaining = (expiry - datetime.now(timezone.utc)).total_seconds()
+    return read_url if remaining > margin_s else None
+
+
+def get_read_url(
+    page_url: str,
+    target: Target,
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Cached URL when it is still valid, otherwise a fresh browser discovery.
+    """
+    read_url = cached_read_url(target, margin_s=margin_s)
+    if read_url:
+        count("read_url_cache.hit")
+        return read_url
+
+    count("read_url_cache.miss")
+    with span("discover", target=_target_key(target)) as s:
+        picked_url, all_urls, matches = discover_picked_url(
+            page_url=page_url,
+            target=target,
+            settle_ms=settle_ms,
+            log=log,
+            pool=get_browser_pool(),
+        )
+        s.set(captured_urls=len(all_urls))
+    cache_read_url(target, picked_url, matches=matches)
+    return picked_url
+
+
+def _traced_fetch(fetch: Callable[..., Any], read_url: str, msgpack: bool, validators: Optional[Validators]) -> Any:
+    with span("fetch") as s:
+        try:
+            result = fetch(read_url, msgpack=msgpack, validators=validators)
+        except NotModified:
+            count("fetch.not_modified")
+            s.set(not_modified=True)
+            raise
+        if isinstance(result, TableColumns):
+            s.set(rows=len(result))
+        else:
+            s.set(rows=len(((result.get("data") or {}).get("table") or {}).get("rows") or []))
+        return result
+
+
+def _fetch_target(
+    fetch: Callable[..., Any],
+    page_url: str,
+    target: Target,
+    margin_s: float,
+    settle_ms: int,
+    log: Optional[Callable[[str], None]],
+    validators: Optional[Validators] = None,
+) -> Tuple[str, Any]:
+    msgpack = _setting_enabled("LAYOFFS_MSGPACK")
+    read_url = get_read_url(page_url, target, margin_s=margin_s, settle_ms=settle_ms, log=log)
+    try:
+        return read_url, _traced_fetch(fetch, read_url, msgpack, validators)
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status not in (401, 403):
+            raise
+        if log:
+            log(f"Read URL rejected with {status}, rediscovering")
+
+    invalidate_read_url(target)
+    read_url = get_read_url(page_url, target, margin_s=margin_s, settle_ms=settle_ms, log=log)
+    return read_url, _traced_fetch(fetch, read_url, msgpack, validators)
+
+
+def fetch_target_json(
+    page_url: str,
+    target: Target,
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    validators: Optional[Validators] = None,
+) -> Tuple[str, dict]:
+    """
+    Returns (read_url, data). A 401/403 on a cached URL drops it and retries
+    once with a freshly discovered one. LAYOFFS_MSGPACK=1 fetches msgpack.
+    With `validators`, raises NotModified when the payload did not change.
+    """
+    return _fetch_target(fetch_json, page_url, target, margin_s, settle_ms, log, validators)
+
+
+def fetch_target_table(
+    page_url: str,
+    target: Target,
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    validators: Optional[Validators] = None,
+) -> Tuple[str, TableColumns]:
+    """
+    Same as fetch_target_json, returning the table column-wise.
+    """
+    return _fetch_target(fetch_table, page_url, target, margin_s, settle_ms, log, validators)
+
+
+@dataclass
+class TargetResult:
+    """
+    Per-target outcome of fetch_targets: `value` is set on success,
+    `not_modified` when the validators matched, `error` otherwise.
+    """
+    target: Target
+    read_url: Optional[str] = None
+    value: Any = None
+    not_modified: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def fetch_targets_async(
+    fetch: Callable[..., Any],
+    page_url: str,
+    targets: List[Target],
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    validators: Optional[Dict[Target, Validators]] = None,
+) -> Dict[Target, TargetResult]:
+    """
+    Fetches several targets with `fetch` (fetch_json or fetch_table). All
+    targets without a valid cached read URL are discovered together in one
+    page load of the shared browser pool; the fetches then run concurrently
+    on worker threads over the shared HTTP session. Failures are reported
+    per target and never stop the others.
+    """
+    targets = list(dict.fromkeys(targets))
+    validators = validators or {}
+    results = {t: TargetResult(target=t) for t in targets}
+
+    missing = [t for t in targets if not cached_read_url(t, margin_s=margin_s)]
+    if missing:
+        with span("discover", targets=len(missing)) as s:
+            found = await asyncio.to_thread(
+                discover_targets, page_url, missing, settle_ms=settle_ms, log=log, pool=get_browser_pool()
+            )
+            s.set(captured_urls=len(found.all_urls), errors=len(found.errors))
+        for target, read_url in found.picked.items():
+            cache_read_url(target, read_url, matches=found.matches[target])
+        for target, error in found.errors.items():
+            results[target].error = error
+
+    def fetch_one(target: Target) -> None:
+        result = results[target]
+        try:
+            result.read_url, result.value = _fetch_target(
+                fetch, page_url, target, margin_s, settle_ms, log, validators.get(target)
+            )
+        except NotModified:
+            result.not_modified = True
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+
+    pending = [t for t in targets if results[t].error is None]
+    await asyncio.gather(*(asyncio.to_thread(fetch_one, t) for t in pending))
+    return results
+
+
+def fetch_targets(
+    fetch: Callable[..., Any],
+    page_url: str,
+    targets: List[Target],
+    margin_s: float = DEFAULT_URL_EXPIRY_MARGIN_S,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    validators: Optional[Dict[Target, Validators]] = None,
+) -> Dict[Target, TargetResult]:
+    """
+    Sync wrapper of fetch_targets_async; not for use inside a running loop.
+    """
+    return asyncio.run(
+        fetch_targets_async(fetch, page_url, targets, margin_s, settle_ms, log, validators)
+    )
+
+
+# ## Snapshot store
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(".cache", "layoffs_snapshot.arrow")
+DEFAULT_SNAPSHOT_MAX_AGE_S = 24 * 60 * 60
+
+_SNAPSHOT_META_KEY = b"layoffs_meta"
+
+
+@dataclass
+class Snapshot:
+    frame: Any  # pandas.DataFrame
+    meta: Dict[str, Any] = field(default_factory=dict)
+    path: Optional[str] = None
+
+    @property
+    def age_s(self) -> float:
+        # Since the payload was last fetched or confirmed unchanged
+        return time.time() - float(self.meta.get("checked_at", self.meta.get("fetched_at", 0)))
+
+
+def freeze_frame(frame):
+    """
+    Marks the frame's column buffers read-only, in place, and returns it.
+    Writing into a frozen frame raises instead of changing it for every
+    session sharing it; with pandas copy-on-write enabled, frames derived
+    from it copy on their first write instead. Python objects inside object
+    columns (the Location HQ lists) are not covered.
+
+    Reaches the buffers through the block manager (`frame._mgr.blocks`),
+    a pandas 2.x internal; if that is not there, the frame is returned as is.
+    """
+    import numpy as np
+
+    blocks = getattr(getattr(frame, "_mgr", None), "blocks", None)
+    if blocks is None:
+        return frame
+    for block in blocks:
+        values = getattr(block, "values", None)
+        for buf in (values, *(getattr(values, attr, None) for attr in ("_ndarray", "_data", "_mask"))):
+            if isinstance(buf, np.ndarray):
+                buf.flags.writeable = False
+    return frame
+
+
+def load_snapshot_path(default: str = DEFAULT_SNAPSHOT_PATH) -> str:
+    return _load_setting("LAYOFFS_SNAPSHOT_PATH", default)
+
+
+def load_snapshot_max_age(default: int = DEFAULT_SNAPSHOT_MAX_AGE_S) -> int:
+    v = _load_setting("LAYOFFS_SNAPSHOT_MAX_AGE_S")
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+def _stored_meta(path: str) -> Optional[Dict[str, Any]]:
+    # Only the file footer and schema are read, not the columns
+    try:
+        import pyarrow as pa
+        with pa.memory_map(path, "r") as source:
+            raw_meta = (pa.ipc.open_file(source).schema.metadata or {}).get(_SNAPSHOT_META_KEY)
+    except Exception:
+        return None
+    return json.loads(raw_meta) if raw_meta else None
+
+
+def save_snapshot(frame, meta: Dict[str, Any], path: Optional[str] = None, source: Optional[str] = None) -> Snapshot:
+    """
+    Writes the processed frame as an uncompressed Arrow IPC file so it can be
+    memory-mapped on load. `meta` is stored in the schema metadata.
+    The file is written to a temp path and swapped in with os.replace.
+
+    `source` is a snapshot file that may already hold this frame (a dataset
+    cache entry); when its stored meta is the same, it is hardlinked (or
+    copied) into place instead of serializing the frame again.
+    """
+    import pyarrow as pa
+
+    path = path or load_snapshot_path()
+    meta = dict(meta)
+    meta.setdefault("fetched_at", time.time())
+    meta["rows"] = int(len(frame))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if source and _stored_meta(source) == json.loads(json.dumps(meta)):
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
+        annotate(rows=meta["rows"], bytes=os.path.getsize(path), linked=True)
+        return Snapshot(frame=frame, meta=meta, path=path)
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    schema_meta = dict(table.schema.metadata or {})
+    schema_meta[_SNAPSHOT_META_KEY] = json.dumps(meta).encode("utf-8")
+    table = table.replace_schema_metadata(schema_meta)
+
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    annotate(rows=meta["rows"], bytes=os.path.getsize(path))
+
+    return Snapshot(frame=frame, meta=meta, path=path)
+
+
+def load_snapshot(path: Optional[str] = None, max_age_s: Optional[float] = None) -> Optional[Snapshot]:
+    """
+    Returns the stored snapshot, or None if it is missing, unreadable or
+    older than `max_age_s` (no age limit when None).
+    """
+    path = path or load_snapshot_path()
+    if not os.path.exists(path):
+        return None
+
+    try:
+        import pyarrow as pa
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+    except Exception:
+        return None
+
+    raw_meta = (table.schema.metadata or {}).get(_SNAPSHOT_META_KEY)
+    meta = json.loads(raw_meta) if raw_meta else {}
+    meta.setdefault("fetched_at", os.path.getmtime(path))
+    # touch_snapshot bumps the mtime when a refresh finds the payload unchanged
+    meta["checked_at"] = max(float(meta["fetched_at"]), os.path.getmtime(path))
+
+    snapshot = Snapshot(frame=None, meta=meta, path=path)
+    if max_age_s is not None and snapshot.age_s > max_age_s:
+        return None
+
+    snapshot.frame = table.to_pandas()
+    annotate(rows=len(snapshot.frame), bytes=os.path.getsize(path))
+    return snapshot
+
+
+def touch_snapshot(snapshot: Snapshot) -> Snapshot:
+    """
+    Marks `snapshot` as confirmed current without rewriting it: the file's
+    mtime is bumped and the returned copy carries `checked_at`. The frame
+    and fetched_at stay the same, so caches keyed on them stay valid.
+    """
+    now = time.time()
+    if snapshot.path:
+        try:
+            os.utime(snapshot.path, (now, now))
+        except OSError:
+            pass
+    return Snapshot(frame=snapshot.frame, meta={**snapshot.meta, "checked_at": now}, path=snapshot.path)
+
+
+def load_target_snapshot(
+    target: Target,
+    schema_version: Optional[int] = None,
+    path: Optional[str] = None,
+    max_age_s: Optional[float] = None,
+) -> Optional[Snapshot]:
+    """
+    load_snapshot, but only if the snapshot was taken from `target` with the
+    same `schema_version`.
+    """
+    snapshot = load_snapshot(path, max_age_s=max_age_s)
+    if snapshot is None or not (
+        snapshot.meta.get("view_id") == target.view_id
+        and snapshot.meta.get("share_id") == target.share_id
+        and snapshot.meta.get("schema_version") == schema_version
+    ):
+        return None
+    return snapshot
+
+
+def reload_target_snapshot(
+    current: Optional[Snapshot],
+    target: Target,
+    schema_version: Optional[int] = None,
+    path: Optional[str] = None,
+) -> Optional[Snapshot]:
+    """
+    load_target_snapshot, unless the file has not been written or touched
+    since `current` was loaded from it: then `current` is returned as is,
+    without reading the file again.
+    """
+    path = path or load_snapshot_path()
+    if current is not None and current.path == path:
+        try:
+            if os.path.getmtime(path) <= float(current.meta.get("checked_at", 0)):
+                return current
+        except OSError:
+            pass
+    return load_target_snapshot(target, schema_version, path=path)
+
+
+# ## Processed dataset cache
+
+DEFAULT_DATASET_CACHE_DIR = os.path.join(".cache", "datasets")
+DEFAULT_DATASET_CACHE_KEEP = 4
+
+
+def schema_fingerprint(columns: List[dict]) -> str:
+    return hashlib.blake2b(json.dumps(columns, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def dataset_key(content_hash: str, columns: List[dict], rows: int, schema_version: Optional[int]) -> str:
+    """
+    Processed-dataset identity: the raw payload hash, plus the column schema,
+    row count and processed layout version as cheap extra checks.
+    """
+    return f"{content_hash}-{schema_fingerprint(columns)}-{rows}-v{schema_version}"
+
+
+class DatasetCache:
+    """
+    On-disk processed datasets by dataset_key, one Arrow file per key in
+    the snapshot format. A hit is memory-mapped instead of reprocessed;
+    only the `keep` most recently used entries are kept.
+    """
+
+    def __init__(self, root: Optional[str] = None, keep: int = DEFAULT_DATASET_CACHE_KEEP):
+        self.root = root or _load_setting("LAYOFFS_DATASET_CACHE_DIR", DEFAULT_DATASET_CACHE_DIR)
+        self.keep = keep
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.arrow")
+
+    def get(self, key: str) -> Optional[Snapshot]:
+        path = self._path(key)
+        entry = load_snapshot(path)
+        if entry is None:
+            count("dataset_cache.miss")
+            return None
+        count("dataset_cache.hit")
+        try:
+            os.utime(path)  # recency for eviction
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, frame, meta: Dict[str, Any]) -> None:
+        try:
+            save_snapshot(frame, {**meta, "dataset_key": key}, path=self._path(key))
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        try:
+            paths = [os.path.join(self.root, n) for n in os.listdir(self.root) if n.endswith(".arrow")]
+        except OSError:
+            return
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_dataset_cache() -> Optional[DatasetCache]:
+    """
+    The configured dataset cache; LAYOFFS_DATASET_CACHE_KEEP=0 disables it.
+    """
+    v = _load_setting("LAYOFFS_DATASET_CACHE_KEEP")
+    try:
+        keep = int(v) if v else DEFAULT_DATASET_CACHE_KEEP
+    except ValueError:
+        keep = DEFAULT_DATASET_CACHE_KEEP
+    return DatasetCache(keep=keep) if keep > 0 else None
+
+
+def _process_cached(
+    table: TableColumns,
+    content_hash: Optional[str],
+    schema_version: Optional[int],
+    build: Callable[[], Tuple[Any, Dict[str, Any]]],
+    meta: Dict[str, Any],
+    cache: Optional[DatasetCache],
+) -> Tuple[Any, Dict[str, Any]]:
+    # build() -> (frame, extra meta); skipped when the same payload was processed before
+    if cache is None or not content_hash:
+        return build()
+    key = dataset_key(content_hash, table.columns, len(table), schema_version)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry.frame, {"dataset_key": key}
+    frame, extra = build()
+    cache.put(key, frame, {**meta, **extra})
+    return frame, {**extra, "dataset_key": key}
+
+
+def _cache_entry_path(meta: Dict[str, Any]) -> Optional[str]:
+    # Where the dataset cache keeps the frame _process_cached returned with `meta`
+    cache = get_dataset_cache()
+    key = meta.get("dataset_key")
+    return cache._path(key) if cache is not None and key else None
+
+
+def _can_update(base: Optional[Snapshot], table: TableColumns) -> bool:
+    # Row hashes cover the raw cells (choice ids), not their labels: after a
+    # column schema change, rows reused by the update would keep stale labels
+    return base is not None and base.meta.get("schema_fingerprint") == schema_fingerprint(table.columns)
+
+
+def _fetch_meta(page_url: str, target: Target, picked_url: str, **extra) -> Dict[str, Any]:
+    expiry = _parse_access_policy_expiry(picked_url)
+    return {
+        "page_url": page_url,
+        "view_id": target.view_id,
+        "share_id": target.share_id,
+        "picked_url": picked_url,
+        "expires": expiry.isoformat() if expiry else None,
+        "fetched_at": time.time(),
+        **extra,
+    }
+
+
+def _process_table(
+    page_url: str,
+    target: Target,
+    picked_url: str,
+    table: TableColumns,
+    validators: Validators,
+    base: Optional[Snapshot],
+    process: Callable[[TableColumns], Any],
+    update: Optional[Callable[[Any, TableColumns], Tuple[Any, Any]]],
+    schema_version: Optional[int],
+    log: Optional[Callable[[str], None]] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    The frame and meta of a new snapshot of `target` from a fetched table:
+    `update` applied to `base` when its column schema still matches,
+    `process` otherwise, or the processed dataset cache entry for the same
+    payload.
+    """
+    def build() -> Tuple[Any, Dict[str, Any]]:
+        if update is not None and base is not None:
+            if _can_update(base, table):
+                with span("update", rows=len(table)) as s:
+                    frame, delta = update(base.frame, table)
+                    s.set(**delta.as_dict())
+                if log:
+                    log(f"Applied delta {delta.as_dict()} to snapshot of {len(base.frame)} rows")
+                return frame, {"delta": delta.as_dict(), "base_fetched_at": base.meta.get("fetched_at")}
+            if log:
+                log("Column schema changed since the snapshot, processing the full table")
+        with span("process", rows=len(table)):
+            return process(table), {}
+
+    meta = _fetch_meta(
+        page_url, target, picked_url, schema_version=schema_version,
+        schema_fingerprint=schema_fingerprint(table.columns), **validators.as_meta(),
+    )
+    frame, extra = _process_cached(
+        table, validators.content_hash, schema_version, build, meta, get_dataset_cache()
+    )
+    meta.update(extra)
+    return frame, meta
+
+
+def load_or_refresh_snapshot(
+    page_url: str,
+    target: Target,
+    process: Callable[[TableColumns], Any],
+    path: Optional[str] = None,
+    max_age_s: Optional[float] = None,
+    settle_ms: int = 12_000,
+    log: Optional[Callable[[str], None]] = None,
+    schema_version: Optional[int] = None,
+    update: Optional[Callable[[Any, TableColumns], Tuple[Any, Any]]] = None,
+) -> Snapshot:
+    """
+    Serves the on-disk snapshot when it is fresh, belongs to `target` and was
+    built with the same `schema_version` of the processed layout; otherwise
+    discovers the read URL, fetches the table, runs `process` on it and
+    stores the result.
+
+    With `update`, a stale but otherwise matching snapshot is refreshed by
+    `update(snapshot.frame, table) -> (frame, delta)` instead of `process`;
+    `delta.as_dict()` and the base snapshot's fetched_at go into the meta.
+    A table whose column schema differs from the snapshot's is processed in
+    full.
+
+    The stale snapshot's validators make the fetch conditional: when the
+    server answers 304 or the body hashes the same, the snapshot is only
+    touched and returned as is.
+    """
+    path = path or load_snapshot_path()
+    max_age_s = load_snapshot_max_age() if max_age_s is None else max_age_s
+
+    with span("snapshot.load"):
+        snapshot = load_target_snapshot(target, schema_version, path=path)
+    if snapshot is not None and snapshot.age_s <= max_age_s:
+        count("snapshot.fresh")
+        return snapshot
+
+    count("snapshot.stale" if snapshot is not None else "snapshot.missing")
+    validators = Validators.from_meta(snapshot.meta) if snapshot is not None else Validators()
+    try:
+        picked_url, table = fetch_target_table(page_url, target, settle_ms=settle_ms, log=log, validators=validators)
+    except NotModified:
+        if log:
+            log("Payload not modified, keeping the stored snapshot")
+        return touch_snapshot(snapshot)
+
+    frame, meta = _process_table(
+        page_url, target, picked_url, table, validators, snapshot, process, update, schema_version, log
+    )
+    try:
+        with span("snapshot.save"):
+            return save_snapshot(frame, meta, path=path, source=_cache_entry_path(meta))
+    except Exception as e:
+        # A read-only disk should not take the dashboard down
+        if log:
+            log(f"Could not write snapshot to {path}: {e}")
+        return Snapshot(frame=frame, meta=meta, path=None)
+
+
+# ## Background refresh
+
+DEFAULT_REFRESH_RETRY_S = 60
+DEFAULT_REFRESH_MAX_BACKOFF_S = 60 * 60
+
+
+def load_refresh_interval() -> int:
+    """
+    Seconds between background refreshes; defaults to the snapshot max age.
+    """
+    v = _load_setting("LAYOFFS_REFRESH_INTERVAL_S")
+    try:
+        return int(v) if v else load_snapshot_max_age()
+    except ValueError:
+        return load_snapshot_max_age()
+
+
+class SnapshotRefresher:
+    """
+    Serves the current snapshot and refreshes it off the request path.
+
+    `refresh()` returns a new Snapshot (typically load_or_refresh_snapshot
+    with `max_age_s=interval_s`). It runs on a daemon thread when the current
+    snapshot reaches `interval_s`, never twice at the same time, and is
+    retried with exponential backoff (`retry_s` doubling up to
+    `max_backoff_s`) while it fails; the previous snapshot keeps being
+    served meanwhile. A new snapshot is swapped in by a single reference
+    assignment, so readers never see a partial one, and its frame is frozen
+    (freeze_frame) first, as every reader shares it.
+
+    `load()` supplies the snapshot to serve at start-up, of any age; only when
+    it returns None does the first caller of current() wait for a refresh.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Snapshot],
+        load: Optional[Callable[[], Optional[Snapshot]]] = None,
+        interval_s: Optional[float] = None,
+        retry_s: float = DEFAULT_REFRESH_RETRY_S,
+        max_backoff_s: float = DEFAULT_REFRESH_MAX_BACKOFF_S,
+        log: Optional[Callable[[str], None]] = None,
+    ):
+        self._refresh = refresh
+        self._load = load
+        self.interval_s = load_refresh_interval() if interval_s is None else interval_s
+        self.retry_s = retry_s
+        self.max_backoff_s = max_backoff_s
+        self.log = log
+
+        self._snapshot: Optional[Snapshot] = None
+        self._flight = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.next_refresh_at = 0.0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def start(self) -> "SnapshotRefresher":
+        if self._thread is not None:
+            return self
+        if self._snapshot is None and self._load is not None:
+            try:
+                self._snapshot = self._frozen(self._load())
+            except Exception as e:
+                if self.log:
+                    self.log(f"Could not load the stored snapshot: {e}")
+        if self._snapshot is not None:
+            self.next_refresh_at = time.time() + max(0.0, self.interval_s - self._snapshot.age_s)
+
+        self._thread = threading.Thread(target=self._run, name="layoffs-refresh", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def current(self) -> Snapshot:
+        """
+        The snapshot to serve. Only blocks on a cold start with nothing stored;
+        raises if that first refresh fails, and keeps raising without another
+        attempt until its backoff is over.
+        """
+        snapshot = self._snapshot
+        if snapshot is None and self.failures and time.time() < self.next_refresh_at:
+            # Reruns during an outage must not each launch a discovery
+            raise RuntimeError(f"No snapshot available: {self.last_error}")
+        if snapshot is None:
+            snapshot = self.refresh_now()
+        if snapshot is None:
+            raise RuntimeError(f"No snapshot available: {self.last_error}")
+        return snapshot
+
+    def trigger(self) -> None:
+        """
+        Asks the background thread to refresh now, without waiting for it.
+        """
+        self.next_refresh_at = 0.0
+        self._wake.set()
+
+    def refresh_now(self) -> Optional[Snapshot]:
+        """
+        Refreshes on the calling thread, or waits for the refresh already in
+        flight. Returns the current snapshot either way.
+        """
+        if self._flight.acquire(blocking=False):
+            try:
+                self._refresh_once()
+            finally:
+                self._flight.release()
+        else:
+            with self._flight:
+                pass
+        return self._snapshot
+
+    def _refresh_once(self) -> None:
+        started = time.time()
+        try:
+            snapshot = self._refresh()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            delay = min(self.max_backoff_s, self.retry_s * 2 ** (self.failures - 1))
+            if self.log:
+                self.log(f"Refresh failed ({self.failures}x), retrying in {delay:.0f}s: {self.last_error}")
+        else:
+            changed = snapshot is not self._snapshot
+            if changed:
+                self._snapshot = self._frozen(snapshot)
+            self.failures = 0
+            self.last_error = None
+            # A snapshot someone else just stored counts from its own fetch time
+            delay = max(self.retry_s, self.interval_s - snapshot.age_s)
+            if self.log and changed:
+                self.log(f"Refreshed snapshot in {time.time() - started:.1f}s, next in {delay:.0f}s")
+        self.next_refresh_at = time.time() + delay
+
+    @staticmethod
+    def _frozen(snapshot: Optional[Snapshot]) -> Optional[Snapshot]:
+        if snapshot is not None and snapshot.frame is not None:
+            freeze_frame(snapshot.frame)
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            timeout = self.next_refresh_at - time.time()
+            if timeout > 0:
+                self._wake.wait(timeout)
+                self._wake.clear()
+                continue
+            self.refresh_now()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+
+def load_read_only() -> bool:
+    """
+    LAYOFFS_READ_ONLY=1: the dashboard never fetches itself and only picks up
+    snapshots written by `python -m layoffs_data refresh`.
+    """
+    return _setting_enabled("LAYOFFS_READ_ONLY")
+
+
+# ## Command line
+#
+#     python -m layoffs_data discover   # fresh browser discovery, caches the read URLs
+#     python -m layoffs_data fetch      # raw payloads only
+#     python -m layoffs_data refresh    # payload + processed table, updates the snapshot
+#     python -m layoffs_data inspect    # stored snapshot and artifact versions
+
+DEFAULT_ARTIFACT_DIR = os.path.join(".cache", "artifacts")
+DEFAULT_ARTIFACT_KEEP = 5
+
+
+def load_artifact_dir(default: str = DEFAULT_ARTIFACT_DIR) -> str:
+    return _load_setting("LAYOFFS_ARTIFACT_DIR", default)
+
+
+@contextmanager
+def _phase(timings: Dict[str, float], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+        print(f"  {name:<10} {timings[name]:8.2f}s")
+
+
+def _artifact_base(target: Target, root: Optional[str] = None) -> str:
+    return os.path.join(root or load_artifact_dir(), f"{target.view_id}-{target.share_id}")
+
+
+def list_artifacts(target: Target, root: Optional[str] = None) -> List[str]:
+    """
+    Complete artifact version directories for `target`, oldest first.
+    """
+    base = _artifact_base(target, root)
+    if not os.path.isdir(base):
+        return []
+    return sorted(
+        name for name in os.listdir(base)
+        if ".tmp-" not in name and os.path.isdir(os.path.join(base, name))
+    )
+
+
+def write_artifacts(
+    target: Target,
+    meta: Dict[str, Any],
+    payload: Optional[dict] = None,
+    frame=None,
+    root: Optional[str] = None,
+    keep: int = DEFAULT_ARTIFACT_KEEP,
+    source: Optional[str] = None,
+) -> str:
+    """
+    Writes one artifact version for `target` and returns its directory:
+    payload.json (raw response), table.arrow (processed frame, snapshot
+    format) and meta.json, whichever are given. The version is assembled in
+    a temp directory and renamed into place, then the latest.json pointer is
+    replaced; only the newest `keep` versions are kept. `source` is passed
+    on to save_snapshot for table.arrow.
+    """
+    base = _artifact_base(target, root)
+    fetched_at = float(meta.get("fetched_at", time.time()))
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(fetched_at)) + f"{int(fetched_at % 1 * 1000):03d}Z"
+    final = os.path.join(base, version)
+    tmp = f"{final}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+
+    try:
+        if payload is not None:
+            with open(os.path.join(tmp, "payload.json"), "w") as f:
+                json.dump(payload, f)
+        if frame is not None:
+            save_snapshot(frame, meta, path=os.path.join(tmp, "table.arrow"), source=source)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({**meta, "version": version}, f, indent=1)
+        os.replace(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    _atomic_write_json(os.path.join(base, "latest.json"), {"version": version})
+    for old in list_artifacts(target, root)[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(base, old), ignore_errors=True)
+    return final
+
+
+def _cmd_discover(args, page_url: str, target: Target, timings: Dict[str, float]) -> None:
+    with _phase(timings, "discover"):
+        result = discover_targets(
+            page_url=page_url,
+            targets=args.targets,
+            settle_ms=args.settle_ms,
+            log=print if args.verbose else None,
+            pool=get_browser_pool(),
+        )
+    print(f"{len(result.all_urls)} readSharedViewData requests")
+    for t in args.targets:
+        if t in result.errors:
+            print(f"{_target_key(t)}: {result.errors[t]}")
+            continue
+        picked_url = result.picked[t]
+        cache_read_url(t, picked_url, matches=result.matches[t])
+        expiry = _parse_access_policy_expiry(picked_url)
+        print(f"{_target_key(t)}: {len(result.matches[t])} matching, expires {expiry.isoformat() if expiry else 'unknown'}")
+        print(f"  {picked_url}")
+
+
+def _cmd_fetch(args, page_url: str, target: Target, timings: Dict[str, float]) -> None:
+    with _phase(timings, "fetch"):
+        results = fetch_targets(fetch_json, page_url, args.targets, settle_ms=args.settle_ms)
+    with _phase(timings, "write"):
+        for t, result in results.items():
+            if not result.ok:
+                print(f"{_target_key(t)}: {result.error}")
+                continue
+            meta = _fetch_meta(page_url, t, result.read_url)
+            print(f"{_target_key(t)}: {write_artifacts(t, meta, payload=result.value, keep=args.keep)}")
+
+
+def _cmd_refresh(args, page_url: str, target: Target, timings: Dict[str, float]) -> None:
+    # Imported here: layoffs_prep itself imports this module
+    from layoffs_prep import DATASET_SCHEMA_VERSION, build_dataset, update_dataset
+
+    path = load_snapshot_path()
+    if args.if_stale:
+        snapshot = load_target_snapshot(target, DATASET_SCHEMA_VERSION, path=path, max_age_s=load_snapshot_max_age())
+        if snapshot is not None:
+            print(f"snapshot is {snapshot.age_s:.0f}s old, nothing to do")
+            return
+
+    base = None if args.full else load_target_snapshot(target, DATASET_SCHEMA_VERSION, path=path)
+    validators = Validators.from_meta(base.meta) if base is not None else Validators()
+
+    with _phase(timings, "read url"):
+        get_read_url(page_url, target, settle_ms=args.settle_ms)
+    payload = None
+    try:
+        with _phase(timings, "fetch"):
+            if args.raw:
+                picked_url, payload = fetch_target_json(page_url, target, settle_ms=args.settle_ms, validators=validators)
+            else:
+                picked_url, table = fetch_target_table(page_url, target, settle_ms=args.settle_ms, validators=validators)
+    except NotModified:
+        touch_snapshot(base)
+        print(f"payload not modified, kept {path}")
+        return
+    if payload is not None:
+        with _phase(timings, "decode"):
+            table = table_from_payload(payload)
+
+    with _phase(timings, "process"):
+        frame, meta = _process_table(
+            page_url, target, picked_url, table, validators, base, build_dataset, update_dataset,
+            DATASET_SCHEMA_VERSION, log=print if args.verbose else None,
+        )
+
+    with _phase(timings, "write"):
+        save_snapshot(frame, meta, path=path, source=_cache_entry_path(meta))
+        out = write_artifacts(target, meta, payload=payload, frame=frame, keep=args.keep, source=path)
+    print(f"{len(frame)} rows{' ' + str(meta['delta']) if 'delta' in meta else ''} -> {path}")
+    print(out)
+
+
+def _cmd_inspect(args, page_url: str, target: Target, timings: Dict[str, float]) -> None:
+    with _phase(timings, "load"):
+        snapshot = load_snapshot()
+    if snapshot is None:
+        print(f"no snapshot at {load_snapshot_path()}")
+    else:
+        print(f"snapshot {snapshot.path}: {len(snapshot.frame)} rows, {snapshot.age_s:.0f}s old")
+        print(json.dumps(snapshot.meta, indent=1, default=str))
+        print(snapshot.frame.dtypes.to_string())
+
+    read_url = cached_read_url(target, margin_s=0)
+    expiry = _parse_access_policy_expiry(read_url) if read_url else None
+    print(f"cached read URL: {'expires ' + expiry.isoformat() if expiry else 'none'}")
+
+    versions = list_artifacts(target)
+    print(f"{len(versions)} artifact versions in {_artifact_base(target)}")
+    for version in versions:
+        print(f"  {version}")
+
+
+_COMMANDS = {
+    "discover": _cmd_discover,
+    "fetch": _cmd_fetch,
+    "refresh": _cmd_refresh,
+    "inspect": _cmd_inspect,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m layoffs_data", description="Layoffs data acquisition.")
+    parser.add_argument("--settle-ms", type=int, default=12_000, help="upper bound for browser discovery")
+    parser.add_argument("--keep", type=int, default=DEFAULT_ARTIFACT_KEEP, help="artifact versions to keep")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("discover", help="discover and cache fresh readSharedViewData URLs, one page load")
+    sub.add_parser("fetch", help="fetch the raw payloads into new artifact versions, concurrently")
+    refresh = sub.add_parser("refresh", help="fetch, process and store a new snapshot")
+    refresh.add_argument("--if-stale", action="store_true", help="skip when the snapshot is still fresh")
+    refresh.add_argument("--full", action="store_true", help="reprocess every row instead of the delta")
+    refresh.add_argument("--no-raw", dest="raw", action="store_false", help="stream the table, keep no payload")
+    sub.add_parser("inspect", help="show the stored snapshot and artifacts")
+    args = parser.parse_args(argv)
+
+    # discover / fetch cover every AIRTABLE_TARGETS entry; refresh / inspect the first
+    args.targets = load_targets()
+    target = args.targets[0]
+    page_url = load_page_url()
+    timings: Dict[str, float] = {}
+    try:
+        _COMMANDS[args.command](args, page_url, target, timings)
+    finally:
+        if timings:
+            print(f"  {'total':<10} {sum(timings.values()):8.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    # Run the importable module so layoffs_prep shares its state
+    from layoffs_data import main as _main
+    sys.exit(_main())
@@ -0,0 +1,189 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from layoffs_trace import annotate
+
+
+class FigureCache:
+    """
+    Thread-safe LRU of serialized Plotly figures, bounded both by entry count
+    and by the total size of the stored JSON. Keys should include a data
+    snapshot fingerprint so a refresh never serves stale figures.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return spec
+
+    def put(self, key: Hashable, spec: str) -> None:
+        size = len(spec)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = spec
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], object]) -> str:
+        """
+        Cached figure JSON for `key`, building and serializing the figure
+        returned by `build` on a miss. Concurrent misses may both build; the
+        result is the same either way.
+        """
+        spec = self.get(key)
+        if spec is None:
+            spec = pio.to_json(build(), validate=False)
+            self.put(key, spec)
+            annotate(cache="miss", bytes=len(spec))
+        else:
+            annotate(cache="hit", bytes=len(spec))
+        return spec
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Above this many points a trace is drawn with WebGL instead of SVG
+DEFAULT_WEBGL_THRESHOLD = 1000
+# Roughly one point per horizontal pixel of a full-width chart
+DEFAULT_MAX_POINTS = 1500
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of `n_out` points
+    of the series (x ascending) that keep its visual shape. The first and
+    last points are always kept; NaN y values count as 0.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    # Bucket boundaries for the n - 2 inner points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:max(nhi, nlo + 1)].mean(), y[nlo:max(nhi, nlo + 1)].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def decimate(x, y, max_points: int = DEFAULT_MAX_POINTS, x_numeric=None):
+    """
+    (x, y) cut down to at most `max_points` with lttb. `x_numeric` gives
+    numeric positions when `x` holds labels (e.g. period codes for dates).
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return x, y
+    keep = lttb(x if x_numeric is None else np.asarray(x_numeric), y, max_points)
+    return x[keep], y[keep]
+
+
+def line_trace(x, y, webgl_threshold: int = DEFAULT_WEBGL_THRESHOLD, **kwargs):
+    """
+    go.Scatter, or go.Scattergl once the series has more than
+    `webgl_threshold` points.
+    """
+    trace = go.Scattergl if len(x) > webgl_threshold else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+# plotly_chart_json fills Streamlit's PlotlyChart message itself (top-level
+# `spec` / `config` and an element id), so it only does so on the Streamlit
+# versions whose message layout it was checked against; anything else goes
+# through st.plotly_chart.
+_PLOTLY_PROTO_VERSIONS = {"1.37.1"}
+
+
+def _plotly_chart_proto(spec: str, config: str, use_container_width: bool):
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    from streamlit.runtime.state.common import compute_widget_id
+
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = "streamlit"
+
+    # Same id as st.plotly_chart gives a chart without key or selections
+    ctx = get_script_run_ctx()
+    proto.spec = spec
+    proto.config = config
+    proto.id = compute_widget_id(
+        "plotly_chart",
+        user_key=None,
+        key=None,
+        plotly_spec=spec,
+        plotly_config=config,
+        selection_mode=("points", "box", "lasso"),
+        is_selection_activated=False,
+        theme="streamlit",
+        form_id="",
+        use_container_width=use_container_width,
+        page=ctx.active_script_hash if ctx else None,
+    )
+    return proto
+
+
+def plotly_chart_json(spec: str, use_container_width: bool = True, config: Optional[dict] = None):
+    """
+    Like st.plotly_chart, but for an already serialized figure: the JSON goes
+    into the chart message as-is instead of being rebuilt, validated and
+    re-serialized on every rerun. On a Streamlit version not listed in
+    _PLOTLY_PROTO_VERSIONS it falls back to st.plotly_chart.
+    """
+    import streamlit as st
+
+    config = dict(config or {})
+    config.setdefault("showLink", False)
+    config.setdefault("linkText", False)
+
+    if st.__version__ not in _PLOTLY_PROTO_VERSIONS:
+        return st.plotly_chart(pio.from_json(spec), use_container_width=use_container_width, config=config)
+    proto = _plotly_chart_proto(spec, json.dumps(config), use_container_width)
+    return st._main._enqueue("plotly_chart", proto)
@@ -0,0 +1,156 @@
+"""
+World geometry for the choropleths.
+
+Build step (re-run when world.geojson changes):
+
+    python -m layoffs_geo
+
+writes a simplified, coordinate-quantized copy of world.geojson to
+static/world.min.geojson plus a country name -> feature id index to
+static/world_index.json. Streamlit serves static/ at app/static/, so the
+figures only carry the asset URL and the browser downloads (and caches) the
+geometry once instead of receiving it inside every chart payload.
+"""
+import os
+import json
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+SOURCE_PATH = "world.geojson"
+ASSET_PATH = os.path.join("static", "world.min.geojson")
+INDEX_PATH = os.path.join("static", "world_index.json")
+DEFAULT_GEOJSON_URL = "app/static/world.min.geojson"
+
+DEFAULT_TOLERANCE = 0.1  # degrees, below half a pixel on the 1500px wide map
+DEFAULT_PRECISION = 2  # decimals kept per coordinate (~1 km)
+
+
+def _perpendicular_distance(p, a, b) -> float:
+    (x, y), (x1, y1), (x2, y2) = p, a, b
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx * dx + dy * dy) ** 0.5
+
+
+def _simplify(points: List[List[float]], tolerance: float) -> List[List[float]]:
+    # Iterative Douglas-Peucker
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        best, index = 0.0, None
+        for i in range(start + 1, end):
+            d = _perpendicular_distance(points[i], points[start], points[end])
+            if d > best:
+                best, index = d, i
+        if index is not None and best > tolerance:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _simplify_ring(ring: List[List[float]], tolerance: float, precision: int) -> Optional[List[List[float]]]:
+    simplified = _simplify(ring, tolerance)
+    out: List[List[float]] = []
+    for x, y in simplified:
+        q = [round(x, precision), round(y, precision)]
+        if not out or out[-1] != q:
+            out.append(q)
+    if out[0] != out[-1]:
+        out.append(out[0])
+    # A closed ring needs at least 4 positions; tiny islands vanish
+    return out if len(out) >= 4 else None
+
+
+def _simplify_polygon(rings, tolerance: float, precision: int):
+    out = []
+    for i, ring in enumerate(rings):
+        r = _simplify_ring(ring, tolerance, precision)
+        if r is None:
+            if i == 0:
+                return None
+            continue
+        out.append(r)
+    return out
+
+
+def simplify_geometry(geometry: dict, tolerance: float, precision: int) -> Optional[dict]:
+    if geometry["type"] == "Polygon":
+        rings = _simplify_polygon(geometry["coordinates"], tolerance, precision)
+        return {"type": "Polygon", "coordinates": rings} if rings else None
+
+    polygons = [
+        p for p in (_simplify_polygon(rings, tolerance, precision) for rings in geometry["coordinates"]) if p
+    ]
+    if not polygons:
+        return None
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def _feature_id(feature: dict) -> str:
+    # '-99' is shared by several disputed territories; make ids unique
+    fid = str(feature.get("id", ""))
+    return fid if fid and fid != "-99" else feature["properties"]["name"]
+
+
+def build_geo_asset(
+    source: str = SOURCE_PATH,
+    asset_path: str = ASSET_PATH,
+    index_path: str = INDEX_PATH,
+    tolerance: float = DEFAULT_TOLERANCE,
+    precision: int = DEFAULT_PRECISION,
+) -> Dict[str, str]:
+    """
+    Writes the simplified asset and the name -> id index; returns the index.
+    """
+    with open(source, "r") as f:
+        geo_json = json.load(f)
+
+    features = []
+    index = {}
+    for feature in geo_json["features"]:
+        name = feature["properties"]["name"]
+        geometry = simplify_geometry(feature["geometry"], tolerance, precision)
+        if geometry is None:
+            # Keep the feature un-simplified rather than drop a country
+            geometry = feature["geometry"]
+        fid = _feature_id(feature)
+        features.append({"type": "Feature", "id": fid, "properties": {"name": name}, "geometry": geometry})
+        index[name] = fid
+
+    os.makedirs(os.path.dirname(asset_path) or ".", exist_ok=True)
+    with open(asset_path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"))
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=0, sort_keys=True)
+
+    return index
+
+
+@lru_cache(maxsize=1)
+def load_geo_index(index_path: str = INDEX_PATH) -> Dict[str, str]:
+    """
+    Country name -> feature id of the built asset, read once per process.
+    """
+    with open(index_path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the simplified world geometry asset.")
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION)
+    args = parser.parse_args()
+
+    index = build_geo_asset(args.source, tolerance=args.tolerance, precision=args.precision)
+    print(
+        f"{len(index)} features: {os.path.getsize(args.source):,} -> "
+        f"{os.path.getsize(ASSET_PATH):,} bytes ({ASSET_PATH})"
+    )
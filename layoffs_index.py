@@ -0,0 +1,340 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Year and Month are Int64 period codes; Quarter is derived from Month
+CUBE_DIMENSIONS = ("Year", "Month", "Industry", "Country", "Stage", "City")
+
+
+def first_locations(locations: pd.Series) -> pd.Series:
+    """
+    First entry of each multi-select `Location HQ` cell, as a categorical.
+    """
+    return locations.str[0].astype("category").rename("City")
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the `k` largest non-NaN `values`, largest first, by partial
+    selection rather than a full sort.
+    """
+    values = np.asarray(values, dtype=float)
+    candidates = np.flatnonzero(~np.isnan(values))
+    if k <= 0:
+        return candidates[:0]
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+def _cube_rows(data: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Year": data["Year"],
+        "Month": data["Month"],
+        "Industry": data["Industry"],
+        "Country": data["Country"],
+        "Stage": data["Stage"],
+        "City": first_locations(data["Location HQ"]),
+        "# Laid Off": data["# Laid Off"],
+        "Company": data["Company"],
+    })
+
+
+def concat_aligned(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat with the categories of each categorical column (as typed in
+    the first frame) unioned first; concat falls back to object dtype
+    unless the categories match exactly.
+    """
+    frames = [f.copy(deep=False) for f in frames]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = frames[0][col].cat.categories
+            for f in frames[1:]:
+                categories = categories.union(f[col].astype("category").cat.categories)
+            for f in frames:
+                f[col] = f[col].astype("category").cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _merge_pairs(pairs: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    merged = pd.concat([pairs, delta], ignore_index=True).groupby(["cell", "company"], sort=False)["rows"].sum()
+    return merged[merged > 0].reset_index()
+
+
+@dataclass(frozen=True)
+class AggregateCube:
+    """
+    Pre-aggregated layoffs keyed by CUBE_DIMENSIONS.
+
+    `cells` has one row per observed dimension combination with its `cell` id,
+    the summed `# Laid Off`, the non-null `Company` count and the `Reports`
+    row count. Distinct companies cannot be summed across cells, so
+    `companies` / `shutdowns` keep the distinct (cell, company) pairs overall
+    and for rows with `%` == 1, with the number of rows behind each pair.
+    `company` is a position in `company_index`, which only ever grows so
+    that apply_delta never has to renumber existing pairs.
+    """
+    cells: pd.DataFrame
+    companies: pd.DataFrame
+    shutdowns: pd.DataFrame
+    company_index: pd.Index
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "AggregateCube":
+        frame = _cube_rows(data)
+
+        grouped = frame.groupby(list(CUBE_DIMENSIONS), observed=True, dropna=False, sort=False)
+        cell = grouped.ngroup().to_numpy()
+        cells = grouped.agg(**{
+            "# Laid Off": ("# Laid Off", "sum"),
+            "Company": ("Company", "count"),
+            "Reports": ("Company", "size"),
+        }).reset_index()
+        cells.insert(0, "cell", range(len(cells)))
+
+        company = data["Company"].cat.codes.to_numpy()
+        shutdown = data["%"].eq(1).fillna(False).to_numpy(dtype=bool)
+        has_company = company >= 0
+
+        pairs = pd.DataFrame({"cell": cell[has_company], "company": company[has_company]})
+        companies = pairs.groupby(["cell", "company"], sort=False).size().rename("rows").reset_index()
+        shutdowns = (
+            pairs[shutdown[has_company]].groupby(["cell", "company"], sort=False).size().rename("rows").reset_index()
+        )
+
+        return cls(
+            cells=cells,
+            companies=companies,
+            shutdowns=shutdowns,
+            company_index=data["Company"].cat.categories,
+        )
+
+    def apply_delta(self, removed: pd.DataFrame, added: pd.DataFrame) -> "AggregateCube":
+        """
+        New cube with the dataset rows in `removed` taken out and those in
+        `added` put in (a changed row is in both). Only the touched rows are
+        grouped; existing cells keep their ids and emptied cells are dropped.
+        """
+        if not len(removed) and not len(added):
+            return self
+
+        rows = concat_aligned([_cube_rows(removed), _cube_rows(added)])
+        sign = np.concatenate([np.full(len(removed), -1), np.ones(len(added), dtype=int)])
+        rows["Reports"] = sign
+        rows["# Laid Off"] = rows["# Laid Off"] * sign
+        company_labels = rows.pop("Company")
+        rows["Company"] = company_labels.notna().to_numpy() * sign
+
+        # Existing cells come first, so group order (and `first` cell id) follows them
+        combined = concat_aligned([self.cells, rows])
+        grouped = combined.groupby(list(CUBE_DIMENSIONS), observed=True, dropna=False, sort=False)
+        group = grouped.ngroup().to_numpy()
+        cells = grouped.agg(**{
+            "cell": ("cell", "first"),
+            "# Laid Off": ("# Laid Off", "sum"),
+            "Company": ("Company", "sum"),
+            "Reports": ("Reports", "sum"),
+        }).reset_index()
+
+        is_new = cells["cell"].isna().to_numpy()
+        next_id = int(self.cells["cell"].max()) + 1 if len(self.cells) else 0
+        cell_ids = cells["cell"].to_numpy(dtype=float, copy=True)
+        cell_ids[is_new] = np.arange(next_id, next_id + is_new.sum())
+        cells["cell"] = cell_ids.astype(np.int64)
+        row_cell = cells["cell"].to_numpy()[group[len(self.cells):]]
+        cells = cells[cells["Reports"] > 0]
+        cells = cells[["cell", *CUBE_DIMENSIONS, "# Laid Off", "Company", "Reports"]].reset_index(drop=True)
+
+        company_index = self.company_index
+        unseen = company_labels[company_labels.notna() & ~company_labels.isin(company_index)]
+        if len(unseen):
+            company_index = company_index.append(pd.Index(pd.unique(unseen.astype(object))))
+        company = company_index.get_indexer(company_labels.astype(object))
+
+        shutdown = np.concatenate([
+            removed["%"].eq(1).fillna(False).to_numpy(dtype=bool),
+            added["%"].eq(1).fillna(False).to_numpy(dtype=bool),
+        ])
+        has_company = company >= 0
+        pairs = pd.DataFrame({"cell": row_cell, "company": company, "rows": sign})[has_company]
+
+        return AggregateCube(
+            cells=cells,
+            companies=_merge_pairs(self.companies, pairs),
+            shutdowns=_merge_pairs(self.shutdowns, pairs[shutdown[has_company]]),
+            company_index=company_index,
+        )
+
+    def slice(self, year=None, industry=None, country=None) -> "AggregateCube":
+        """
+        Sub-cube for the selected Year code / Industry / Country (None = all).
+        """
+        mask = pd.Series(True, index=self.cells.index)
+        if year is not None:
+            mask &= self.cells["Year"].eq(year).fillna(False)
+        if industry is not None:
+            mask &= self.cells["Industry"].eq(industry).fillna(False)
+        if country is not None:
+            mask &= self.cells["Country"].eq(country).fillna(False)
+
+        cells = self.cells[mask]
+        keep = cells["cell"]
+        return AggregateCube(
+            cells=cells,
+            companies=self.companies[self.companies["cell"].isin(keep)],
+            shutdowns=self.shutdowns[self.shutdowns["cell"].isin(keep)],
+            company_index=self.company_index,
+        )
+
+    def _key(self, dim: str) -> pd.Series:
+        if dim == "Quarter":
+            return (self.cells["Month"] // 3).rename("Quarter")
+        return self.cells[dim]
+
+    def rollup(self, dim: str, distinct: bool = False) -> pd.DataFrame:
+        """
+        Totals per value of `dim` (any cube dimension, or Quarter). With
+        `distinct`, also the number of distinct companies and of distinct
+        shut-down companies.
+        """
+        key = self._key(dim)
+        out = self.cells.groupby(key, observed=True)[["# Laid Off", "Company", "Reports"]].sum()
+
+        if distinct:
+            cell_key = pd.DataFrame({"cell": self.cells["cell"], dim: key})
+            for name, pairs in (("Total Companies", self.companies), ("# Companies Shutdown", self.shutdowns)):
+                counts = pairs.merge(cell_key, on="cell").groupby(dim, observed=True)["company"].nunique()
+                out[name] = counts.reindex(out.index, fill_value=0)
+
+        return out.reset_index()
+
+
+FILTER_DIMENSIONS = ("Year", "Industry", "Country", "Company")
+
+
+@dataclass(frozen=True)
+class InvertedIndex:
+    """
+    Per-dimension inverted index: for every value, the sorted row positions
+    holding it. `codes[dim]` maps each row to its value's position in
+    `values[dim]` (-1 when missing); values are in first-appearance order.
+    `measured_rows` are the rows with a non-null `# Laid Off`.
+    """
+    values: Dict[str, pd.Index]
+    codes: Dict[str, np.ndarray]
+    postings: Dict[str, List[np.ndarray]]
+    measured_rows: np.ndarray
+    n_rows: int
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, dims=FILTER_DIMENSIONS) -> "InvertedIndex":
+        values, codes, postings = {}, {}, {}
+        for dim in dims:
+            dim_codes, uniques = pd.factorize(data[dim], sort=False)
+            order = np.argsort(dim_codes, kind="stable")
+            counts = np.bincount(dim_codes[dim_codes >= 0], minlength=len(uniques))
+            start = int((dim_codes < 0).sum())  # missing values sort first
+            values[dim] = pd.Index(uniques)
+            codes[dim] = dim_codes
+            postings[dim] = np.split(order[start:], np.cumsum(counts)[:-1])
+
+        measured_rows = np.flatnonzero(data["# Laid Off"].notna().to_numpy())
+        return cls(values=values, codes=codes, postings=postings, measured_rows=measured_rows, n_rows=len(data))
+
+    def rows(self, dim: str, value) -> np.ndarray:
+        pos = self.values[dim].get_indexer([value])[0]
+        return self.postings[dim][pos] if pos >= 0 else np.empty(0, dtype=np.intp)
+
+    def select(self, filters: Dict[str, object]) -> Optional[np.ndarray]:
+        """
+        Sorted row positions matching every `dim -> value` filter, or None
+        when there are no filters (all rows).
+        """
+        if not filters:
+            return None
+        row_sets = sorted((self.rows(dim, value) for dim, value in filters.items()), key=len)
+        selection = row_sets[0]
+        for rows in row_sets[1:]:
+            if not len(selection):
+                break
+            selection = np.intersect1d(selection, rows, assume_unique=True)
+        return selection
+
+    def counts(self, dim: str, rows: Optional[np.ndarray] = None) -> pd.Series:
+        """
+        Exact row count per value of `dim`, over `rows` (default: all rows),
+        in first-appearance order and without zero counts.
+        """
+        dim_codes = self.codes[dim] if rows is None else self.codes[dim][rows]
+        order = pd.unique(dim_codes[dim_codes >= 0])
+        counts = np.bincount(dim_codes[dim_codes >= 0], minlength=len(self.values[dim]))
+        return pd.Series(counts[order], index=self.values[dim][order], name=dim)
+
+
+SORT_COLUMNS = ("Day", "Company", "# Laid Off", "Industry", "Country", "Stage")
+
+
+@dataclass(frozen=True)
+class SortIndex:
+    """
+    Precomputed sort order per column: `ranks[col][row]` is the row's
+    position when the whole dataset is sorted by `col` (stable, categories
+    by label), `missing[col]` flags null values, which always sort last.
+    Ordering any row subset is then an argsort of small integers, and the
+    largest rows overall are read off the end of `orders[col]`.
+    """
+    ranks: Dict[str, np.ndarray]
+    missing: Dict[str, np.ndarray]
+    orders: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, columns=SORT_COLUMNS) -> "SortIndex":
+        ranks, missing, orders = {}, {}, {}
+        for col in columns:
+            values = data[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Category order is not necessarily alphabetical
+                values = values.cat.reorder_categories(sorted(values.cat.categories, key=str))
+            order = values.reset_index(drop=True).sort_values(kind="stable", na_position="last").index.to_numpy()
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            ranks[col] = rank
+            missing[col] = values.isna().to_numpy()
+            orders[col] = order
+        return cls(ranks=ranks, missing=missing, orders=orders)
+
+    def order(self, col: str, rows: Optional[np.ndarray] = None, ascending: bool = True) -> np.ndarray:
+        """
+        `rows` (default: all rows) sorted by `col`, nulls last either way.
+        """
+        rank = self.ranks[col] if rows is None else self.ranks[col][rows]
+        if not ascending:
+            missing = self.missing[col] if rows is None else self.missing[col][rows]
+            rank = np.where(missing, len(self.ranks[col]), -rank)
+        positions = np.argsort(rank, kind="stable")
+        return positions if rows is None else rows[positions]
+
+    def top(self, col: str, k: int, rows: Optional[np.ndarray] = None, require=()) -> np.ndarray:
+        """
+        The `k` rows of `rows` (default: all rows) with the largest `col`,
+        largest first. Rows missing `col` or any `require` column are skipped.
+        """
+        skip = [self.missing[c] for c in (col, *require)]
+        if rows is not None:
+            rows = rows[~np.logical_or.reduce([m[rows] for m in skip])]
+            return rows[top_k(self.ranks[col][rows], k)]
+
+        # Walk the full order from the top in growing windows, so only about
+        # k rows (plus the skipped ones) are looked at
+        order = self.orders[col]
+        picked, end, window = [], len(order), max(k, 1)
+        while end > 0 and sum(map(len, picked)) < k:
+            start = max(0, end - window)
+            chunk = order[start:end][::-1]
+            picked.append(chunk[~np.logical_or.reduce([m[chunk] for m in skip])])
+            end, window = start, window * 2
+        return np.concatenate(picked)[:k] if picked else order[:0]
@@ -0,0 +1,271 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from layoffs_data import TableColumns, table_to_frame
+from layoffs_index import AggregateCube, concat_aligned
+
+
+CHOICE_COLUMNS = ("Location HQ", "Industry", "Country", "Stage")
+
+# Bump when the processed dataset's columns or dtypes change, so stored
+# snapshots built with an older layout are refreshed instead of reused
+DATASET_SCHEMA_VERSION = 3
+
+CATEGORY_COLUMNS = ("Company", "Country", "Industry", "Stage")
+NUMERIC_COLUMNS = ("# Laid Off", "%")
+# Integer period ordinals (pandas Period.ordinal), formatted only at render time
+PERIOD_COLUMNS = {"Year": "Y", "Quarter": "Q", "Month": "M", "Day": "D"}
+# uint64 content hash of the row's raw cell values, used for delta refreshes
+ROW_HASH_COLUMN = "row_hash"
+
+_FNV_PRIME = np.uint64(1099511628211)
+
+
+@dataclass(frozen=True)
+class ChoiceColumn:
+    column_id: str
+    name: str
+    index: pd.Index  # choice ids
+    labels: np.ndarray  # choice names, aligned with `index`
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    names: Dict[str, str]  # column id -> column name
+    choices: Dict[str, ChoiceColumn]  # column name -> choice lookup
+
+
+def compile_schema(columns: List[dict]) -> CompiledSchema:
+    """
+    One pass over data.table.columns: column names plus a choice id -> label
+    lookup array for every select / multi-select column.
+    """
+    names = {}
+    choices = {}
+    for item in columns:
+        names[item["id"]] = item["name"]
+        opts = (item.get("typeOptions") or {}).get("choices")
+        if not opts:
+            continue
+        ids = [c["id"] for c in opts.values()]
+        labels = np.array([c["name"] for c in opts.values()], dtype=object)
+        choices[item["name"]] = ChoiceColumn(
+            column_id=item["id"],
+            name=item["name"],
+            index=pd.Index(ids),
+            labels=labels,
+        )
+    return CompiledSchema(names=names, choices=choices)
+
+
+def _lookup(values: np.ndarray, choice: ChoiceColumn) -> np.ndarray:
+    # Unknown ids (and missing cells) are passed through unchanged
+    codes = choice.index.get_indexer(values)
+    return np.where(codes >= 0, choice.labels.take(codes), values)
+
+
+def decode_choices(series: pd.Series, choice: ChoiceColumn) -> pd.Series:
+    """
+    Maps choice ids to labels for a whole column at once. Multi-select cells
+    (lists of ids) are exploded, decoded flat and re-split into lists.
+    """
+    is_list = series.map(type).eq(list).to_numpy()
+    if not is_list.any():
+        return pd.Series(_lookup(series.to_numpy(dtype=object), choice), index=series.index, name=series.name)
+
+    out = series.to_numpy(dtype=object).copy()
+    if (~is_list).any():
+        out[~is_list] = _lookup(out[~is_list], choice)
+
+    lists = series[is_list]
+    lengths = lists.str.len().to_numpy()
+    flat = lists.explode().to_numpy(dtype=object)
+    # explode() leaves one NaN for an empty list
+    flat = flat[np.repeat(lengths > 0, np.maximum(lengths, 1))]
+    decoded = _lookup(flat, choice)
+    parts = np.empty(len(lengths), dtype=object)
+    # Filled element-wise so equal-length lists are not broadcast into 2-D
+    parts[:] = [list(part) for part in np.split(decoded, np.cumsum(lengths)[:-1])]
+    out[is_list] = parts
+
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+def decode_table(table: TableColumns, schema: Optional[CompiledSchema] = None) -> pd.DataFrame:
+    schema = schema or compile_schema(table.columns)
+    data = table_to_frame(table)
+    for name in CHOICE_COLUMNS:
+        if name in data.columns and name in schema.choices:
+            data[name] = decode_choices(data[name], schema.choices[name])
+    return data
+
+
+def period_codes(dates: pd.Series, freq: str) -> pd.Series:
+    """
+    Nullable Int64 period ordinals of `dates` at `freq`.
+    """
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    periods = dates.dt.to_period(freq)
+    codes = pd.array(periods.array.asi8, dtype="Int64")
+    codes[periods.isna().to_numpy()] = pd.NA
+    return pd.Series(codes, index=dates.index, name=dates.name)
+
+
+def period_labels(codes, freq: str, fmt: Optional[str] = None) -> List[str]:
+    """
+    Labels for period ordinals, e.g. 2023 / 2023Q1 / 2023-01 / 2023-01-31,
+    or `fmt` via strftime.
+    """
+    ordinals = pd.Series(codes, dtype="Int64").fillna(np.iinfo(np.int64).min).to_numpy(dtype=np.int64)
+    index = pd.PeriodIndex.from_ordinals(ordinals, freq=freq)
+    return list(index.strftime(fmt) if fmt else index.astype(str))
+
+
+def period_label(code, freq: str, fmt: Optional[str] = None) -> str:
+    return period_labels([code], freq, fmt=fmt)[0]
+
+
+def build_dataset(table: TableColumns) -> pd.DataFrame:
+    """
+    Decoded table plus the derived columns the dashboard uses, typed:
+    categorical dimensions, nullable Float64 measures and Int64 period codes.
+    """
+    data = decode_table(table)
+
+    data['Date'] = pd.to_datetime(data['Date'])
+    data['Date Added'] = pd.to_datetime(data['Date Added'])
+
+    data['Country'] = data['Country'].replace('United States', 'United States of America')
+
+    for col in NUMERIC_COLUMNS:
+        data[col] = pd.to_numeric(data[col], errors='coerce').astype('Float64')
+    for col in CATEGORY_COLUMNS:
+        data[col] = data[col].astype('category')
+    for col, freq in PERIOD_COLUMNS.items():
+        data[col] = period_codes(data['Date'], freq)
+
+    data[ROW_HASH_COLUMN] = row_hashes(table)
+
+    return data
+
+
+# ## Delta refresh
+
+def _object_array(values: list) -> np.ndarray:
+    # np.asarray would turn equal-length lists into a 2-D array
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def row_hashes(table: TableColumns) -> np.ndarray:
+    """
+    uint64 hash per row over its raw cell values, combined column by column
+    in column id order.
+    """
+    hashes = np.zeros(len(table), dtype=np.uint64)
+    for col in sorted(table.values):
+        values = table.values[col]
+        try:
+            col_hash = pd.util.hash_array(_object_array(values), categorize=False)
+        except (TypeError, ValueError):
+            # Multi-select / nested cells: hash their JSON text instead
+            values = [json.dumps(v, sort_keys=True) if isinstance(v, (list, dict)) else v for v in values]
+            col_hash = pd.util.hash_array(_object_array(values), categorize=False)
+        hashes = (hashes ^ col_hash) * _FNV_PRIME  # wraps mod 2**64
+    return hashes
+
+
+def subset_table(table: TableColumns, positions: np.ndarray) -> TableColumns:
+    return TableColumns(
+        columns=table.columns,
+        values={col: [buf[i] for i in positions] for col, buf in table.values.items()},
+        ids=[table.ids[i] for i in positions],
+    )
+
+
+@dataclass(frozen=True)
+class TableDelta:
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"added": len(self.added), "changed": len(self.changed), "removed": len(self.removed)}
+
+
+def update_dataset(previous: pd.DataFrame, table: TableColumns) -> Tuple[pd.DataFrame, TableDelta]:
+    """
+    Applies a freshly fetched table to a dataset built by build_dataset.
+    Rows are matched by record `id` and compared by row hash; only new and
+    changed rows are decoded. The result follows the table's row order.
+    """
+    hashes = row_hashes(table)
+    ids = pd.Index(table.ids)
+    previous_ids = pd.Index(previous['id'])
+
+    pos = previous_ids.get_indexer(ids)
+    known = pos >= 0
+    previous_hashes = previous[ROW_HASH_COLUMN].to_numpy()
+    same = known.copy()
+    same[known] = previous_hashes[pos[known]] == hashes[known]
+
+    delta = TableDelta(
+        added=list(ids[~known]),
+        changed=list(ids[known & ~same]),
+        removed=list(previous_ids[~previous_ids.isin(ids)]),
+    )
+    if not delta:
+        return previous, delta
+
+    fresh_positions = np.flatnonzero(~same)
+    reused = previous.iloc[pos[same]]
+    if len(fresh_positions):
+        fresh = build_dataset(subset_table(table, fresh_positions))
+        combined = concat_aligned([reused, fresh])
+    else:
+        combined = reused.reset_index(drop=True)
+
+    order = np.concatenate([np.flatnonzero(same), fresh_positions])
+    data = combined.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+    return data, delta
+
+
+def changed_rows(previous: pd.DataFrame, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Boolean masks of the rows of `previous` that are gone from `data` and of
+    the rows of `data` that are not in `previous`, by (id, row hash). A
+    changed record shows up in both.
+    """
+    previous_keys = pd.MultiIndex.from_arrays([previous["id"], previous[ROW_HASH_COLUMN]])
+    keys = pd.MultiIndex.from_arrays([data["id"], data[ROW_HASH_COLUMN]])
+    return ~previous_keys.isin(keys), ~keys.isin(previous_keys)
+
+
+def refresh_cube(
+    cube: Optional[AggregateCube],
+    previous: Optional[pd.DataFrame],
+    data: pd.DataFrame,
+    meta: Dict[str, object],
+    previous_fetched_at: Optional[float],
+) -> AggregateCube:
+    """
+    Cube for `data`, given `cube` built from `previous`. Only when `data` is
+    `previous` with a delta applied (its meta has the delta of a refresh
+    based on the snapshot fetched at `previous_fetched_at`) are the changed
+    rows applied to `cube`. A full rebuild can relabel rows without changing
+    their row hash (a renamed choice, a new dataset layout), so it is
+    aggregated from scratch.
+    """
+    if cube is None or previous is None or "delta" not in meta or meta.get("base_fetched_at") != previous_fetched_at:
+        return AggregateCube.from_frame(data)
+    removed, added = changed_rows(previous, data)
+    return cube.apply_delta(previous[removed], data[added])
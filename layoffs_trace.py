@@ -0,0 +1,158 @@
+"""
+Lightweight instrumentation: named spans and counters.
+
+    with span("fetch", target=...) as s:
+        ...
+        s.set(bytes=len(body), rows=n)
+    count("url_cache.hit")
+
+Every finished span records wall and CPU time (of the calling thread), the
+process's peak RSS and any fields set on it, and is emitted as one JSON log
+line on the "layoffs" logger. Recent spans, per-name totals and counters are
+kept in memory for the dashboard's diagnostics panel.
+"""
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+logger = logging.getLogger("layoffs")
+
+DEFAULT_RECENT_SPANS = 500
+
+_lock = threading.Lock()
+_recent: "deque[Dict[str, Any]]" = deque(maxlen=DEFAULT_RECENT_SPANS)
+_totals: Dict[str, Dict[str, float]] = {}
+_counters: Dict[str, int] = {}
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("layoffs_span", default=None)
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """
+    Sends the "layoffs" log lines to stderr unless a handler is already set
+    up. Safe to call on every Streamlit rerun.
+    """
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux (bytes on macOS, where this overstates by 1024x)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Span:
+    def __init__(self, name: str, fields: Dict[str, Any]):
+        self.name = name
+        self.fields = dict(fields)
+        parent = _current.get()
+        self.parent = parent.name if parent is not None else None
+
+    def set(self, **fields) -> "Span":
+        self.fields.update(fields)
+        return self
+
+
+def _record(span: Span, wall_s: float, cpu_s: float, error: Optional[str]) -> Dict[str, Any]:
+    record = {
+        "span": span.name,
+        "parent": span.parent,
+        "wall_s": round(wall_s, 6),
+        "cpu_s": round(cpu_s, 6),
+        "peak_rss_mb": peak_rss_mb(),
+        "at": time.time(),
+        **span.fields,
+    }
+    if error:
+        record["error"] = error
+
+    with _lock:
+        _recent.append(record)
+        totals = _totals.setdefault(span.name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0, "errors": 0})
+        totals["count"] += 1
+        totals["wall_s"] += wall_s
+        totals["cpu_s"] += cpu_s
+        totals["max_wall_s"] = max(totals["max_wall_s"], wall_s)
+        totals["errors"] += bool(error)
+    return record
+
+
+@contextmanager
+def span(name: str, **fields) -> Iterator[Span]:
+    """
+    Times the block as span `name`; nested spans record their parent.
+    """
+    s = Span(name, fields)
+    token = _current.set(s)
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield s
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        record = _record(s, time.perf_counter() - wall0, time.thread_time() - cpu0, error)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, default=str))
+
+
+def annotate(**fields) -> None:
+    """
+    Sets fields on the innermost open span, if any.
+    """
+    current = _current.get()
+    if current is not None:
+        current.set(**fields)
+
+
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def log_message(message: str) -> None:
+    """
+    `log` callback for the layoffs_data functions: one structured line.
+    """
+    parent = _current.get()
+    logger.info(json.dumps({"message": message, "span": parent.name if parent is not None else None}))
+
+
+def recent_spans(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    with _lock:
+        spans = list(_recent)
+    return spans[-limit:] if limit else spans
+
+
+def span_totals() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+
+def counters() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+
+def reset() -> None:
+    with _lock:
+        _recent.clear()
+        _totals.clear()
+        _counters.clear()
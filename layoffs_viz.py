@@ -5,22 +5,45 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.subplots as sp
-import json
+import functools
+import threading
 
 from layoffs_data import (
     Target,
     load_target,
     load_page_url,
-    discover_picked_url,
-    fetch_json,
+    load_geojson_url,
+    load_refresh_interval,
+    load_read_only,
+    load_log_level,
+    load_admin_token,
+    load_target_snapshot,
+    reload_target_snapshot,
+    load_or_refresh_snapshot,
+    SnapshotRefresher,
 )
+from layoffs_prep import (
+    DATASET_SCHEMA_VERSION,
+    build_dataset,
+    update_dataset,
+    refresh_cube,
+    period_label,
+    period_labels,
+)
+from layoffs_index import AggregateCube, InvertedIndex, SortIndex, SORT_COLUMNS, top_k
+from layoffs_figures import DEFAULT_WEBGL_THRESHOLD, FigureCache, decimate, line_trace, plotly_chart_json
+from layoffs_geo import load_geo_index
+from layoffs_trace import configure_logging, counters, log_message, peak_rss_mb, recent_spans, span, span_totals
 
 # +
-# Read the world.geojson file
-with open('world.geojson', 'r') as f:
-    geo_json = json.load(f)
+# Country name -> feature id of the pre-built geometry asset (python -m layoffs_geo).
+# The browser fetches the geometry itself from GEOJSON_URL, so figures only carry ids.
+geo_index = load_geo_index()
+GEOJSON_URL = load_geojson_url()
     
 st.set_page_config(layout="wide")
+# Spans and refresh messages go out as JSON lines on the "layoffs" logger
+configure_logging(load_log_level())
 # -
 
 # ## Loading Data
@@ -28,161 +51,172 @@ st.set_page_config(layout="wide")
 PAGE_URL = load_page_url()
 
 
-@st.cache_data(ttl=10 * 24 * 60 * 60, show_spinner=True)
-def get_latest_json_cached(page_url: str, view_id: str, share_id: str):
-    # Cache-friendly: only primitives as inputs
+# ### Data Preprocessing
+# See layoffs_prep.build_dataset: the column schema is compiled once and
+# choice ids are decoded column-at-a-time.
+
+REFRESH_INTERVAL_S = load_refresh_interval()
+
+# The snapshot frame is shared by every session and frozen by the refresher:
+# anything derived from it copies on its first write instead of writing through
+pd.set_option('mode.copy_on_write', True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_refresher(page_url: str, view_id: str, share_id: str):
+    # One refresher per target for the whole server: sessions read its current
+    # snapshot and discovery + fetch run on its background thread, never on a rerun.
+    # A stale snapshot is refreshed in place: only new / changed records are decoded.
     target = Target(view_id=view_id, share_id=share_id)
-    picked_url, all_urls, matching_urls = discover_picked_url(
-        page_url=page_url,
-        target=target,
-        settle_ms=12_000,
+
+    def reload():
+        # Read-only mode: snapshots come from `python -m layoffs_data refresh`;
+        # an unchanged file is not read again
+        snapshot = reload_target_snapshot(refresher.snapshot, target, DATASET_SCHEMA_VERSION)
+        if snapshot is None:
+            raise RuntimeError("No snapshot stored yet; run `python -m layoffs_data refresh`")
+        return snapshot
+
+    def refresh():
+        return load_or_refresh_snapshot(
+            page_url=page_url,
+            target=target,
+            process=build_dataset,
+            update=update_dataset,
+            max_age_s=REFRESH_INTERVAL_S,
+            settle_ms=12_000,
+            log=log_message,
+            schema_version=DATASET_SCHEMA_VERSION,
+        )
+
+    refresher = SnapshotRefresher(
+        reload if load_read_only() else refresh,
+        load=lambda: load_target_snapshot(target, DATASET_SCHEMA_VERSION),
+        interval_s=REFRESH_INTERVAL_S,
+        log=log_message,
     )
-    data = fetch_json(picked_url)
-    return picked_url, all_urls, matching_urls, data
+    return refresher.start()
 
 
 target = load_target()
 
-picked_url, all_urls, matching_urls, json_data = get_latest_json_cached(
-    PAGE_URL, target.view_id, target.share_id
-)
+refresher = get_refresher(PAGE_URL, target.view_id, target.share_id)
+if refresher.snapshot is None:
+    # Cold start with no stored snapshot: nothing to serve until the first fetch
+    with st.spinner("Loading the layoffs data..."):
+        snapshot = refresher.current()
+else:
+    snapshot = refresher.current()
+# Shared by every session: treat as read-only
+data, snapshot_meta = snapshot.frame, snapshot.meta
 
 # +
 # Only for Jupyter
 
-# from layoffs_data import Target, discover_all_and_pick_readsharedviewdata_url_async, fetch_json 
+# from layoffs_data import Target, discover_all_and_pick_readsharedviewdata_url_async, fetch_table 
 
 # picked_url, all_urls, matching_urls = await discover_all_and_pick_readsharedviewdata_url_async( page_url=PAGE_URL, target=target, settle_ms=12_000, log=print ) 
-# json_data = fetch_json(picked_url)
+# data = build_dataset(fetch_table(picked_url))
 # -
 
-# ### Data Preprocessing
 
-# +
-key_map = {}
-            
-for item in json_data['data']['table']['columns']:
-    id_ = item['id']
-    name_ = item['name']
-    key_map[id_] = name_
-# -
+@st.cache_resource(show_spinner=False)
+def get_cube_state():
+    # The latest cube and the data it was built from, shared read-only across sessions
+    return {'lock': threading.Lock(), 'fetched_at': None, 'data': None, 'cube': None}
 
-print(key_map)
 
-# +
-key_map_switch = { key_map[k]:k for k in key_map}
-
-#Location HQ
-for item in json_data['data']['table']['columns']:
-    if item['id']==key_map_switch['Location HQ']:
-        for i in item['typeOptions']['choices'].values():
-            id_ = i['id']
-            name_ = i['name']
-            key_map[id_] = name_
-    
-#Industry
-for item in json_data['data']['table']['columns']:
-    if item['id']==key_map_switch['Industry']:
-        for i in item['typeOptions']['choices'].values():
-            id_ = i['id']
-            name_ = i['name']
-            key_map[id_] = name_
-
-#Country
-for item in json_data['data']['table']['columns']:
-    if item['id']==key_map_switch['Country']:
-        for i in item['typeOptions']['choices'].values():
-            id_ = i['id']
-            name_ = i['name']
-            key_map[id_] = name_
-
-#Stage
-for item in json_data['data']['table']['columns']:
-    if item['id']==key_map_switch['Stage']:
-        for i in item['typeOptions']['choices'].values():
-            id_ = i['id']
-            name_ = i['name']
-            key_map[id_] = name_
+def get_cube(data, meta):
+    # Built once per data refresh (fetched_at); a refresh that applied a delta
+    # to the data the current cube was built from only applies the changed rows
+    state = get_cube_state()
+    fetched_at = meta.get('fetched_at', 0)
+    with state['lock']:
+        if state['fetched_at'] != fetched_at:
+            try:
+                cube = refresh_cube(state['cube'], state['data'], data, meta, state['fetched_at'])
+            except Exception as e:
+                # Never leave every session stuck on a failing update
+                log_message(f"Incremental cube update failed, rebuilding: {type(e).__name__}: {e}")
+                cube = AggregateCube.from_frame(data)
+            state.update(fetched_at=fetched_at, data=data, cube=cube)
+        return state['cube']
 
-# -
 
-row_data = []
-for item in json_data['data']['table']['rows']:
-    item['cellValuesByColumnId']['id'] = item['id']
-    row_data.append(item['cellValuesByColumnId'])
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_row_index_cached(_data, view_id: str, share_id: str, fetched_at: float):
+    # `_data` is not hashed; the snapshot it belongs to is identified by fetched_at
+    return InvertedIndex.from_frame(_data)
 
 
-# +
-def replace_values(data, replacements):
-    for item in data:
-        for key, value in item.items():
-            if key in [key_map_switch[i] for i in key_map_switch if i in ['Location HQ', 'Industry', 'Stage', 'Country']]:
-                if isinstance(value, list):
-                    item[key] = [replacements[item] for item in value]
-                else:
-                    item[key] = replacements[value]
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_sort_index_cached(_data, view_id: str, share_id: str, fetched_at: float):
+    # Sort ranks of the reports table's columns, computed once per snapshot
+    return SortIndex.from_frame(_data)
 
-replace_values(row_data, key_map)
 
+cube = get_cube(data, snapshot_meta)
+row_index = get_row_index_cached(data, target.view_id, target.share_id, snapshot_meta.get('fetched_at', 0))
+sort_index = get_sort_index_cached(data, target.view_id, target.share_id, snapshot_meta.get('fetched_at', 0))
 
-# +
-def replace_keys(data, replacements):
-    for item in data:
-        item_copy = item.copy()
-        for key, value in item_copy.items():
-            item[replacements.get(key, key)] = item.pop(key, None)
 
-replace_keys(row_data, key_map)
-# -
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    # One LRU of rendered figures shared by every session
+    return FigureCache(max_entries=256, max_bytes=64 * 1024 * 1024)
 
-data = pd.DataFrame(row_data)
-data['Date'] = pd.to_datetime(data['Date'])
-data['Date Added'] = pd.to_datetime(data['Date Added'])
 
-data['Country'] = data['Country'].replace('United States', 'United States of America')
-data['Month'] = data['Date'].dt.to_period('M').astype(str)
-data['Year'] = data['Date'].dt.to_period('Y').astype(str)
-data['Quarter'] = data['Date'].dt.to_period('Q').astype(str)
-data['Day'] = data['Date'].dt.to_period('D').astype(str)
+figure_cache = get_figure_cache()
+snapshot_key = (target.view_id, target.share_id, snapshot_meta.get('fetched_at', 0))
 
 
-def time_layoff(data):
-    
-    year = data.groupby(['Year']).agg({'# Laid Off':'sum','Company':'count'}).reset_index()
-    month = data.groupby(['Month']).agg({'# Laid Off':'sum','Company':'count'}).reset_index()
-    quarter = data.groupby(['Quarter']).agg({'# Laid Off':'sum','Company':'count'}).reset_index()
-    
-    buttons = [
-        dict(
-            label="Month",
-            method="update",
-            args=[
-                {"x": [month["Month"]], "y2": [month["# Laid Off"]], "y1":[month['Company']]},
-            ],
-        ),
-        dict(
-            label="Year",
-            method="update",
-            args=[
-                {"x": [year["Year"]], "y2": [year["# Laid Off"]], "y1":[year['Company']]},
-            ],
-        ),
-        dict(
-            label="Quarter",
-            method="update",
-            args=[
-                {"x": [quarter["Quarter"]], "y2": [quarter["# Laid Off"]], "y1":[quarter['Company']]},
-            ],
-        ),
-    ]
-    
+def show_chart(name, filter_key, build, config=None):
+    # Figures are keyed by data snapshot + chart + filter selection
+    with span(f"chart.{name}"):
+        spec = figure_cache.get_or_build((snapshot_key, name, filter_key), build)
+        plotly_chart_json(spec, use_container_width=True, config=config)
+
+
+TIME_GRANULARITIES = {'Month': 'M', 'Quarter': 'Q', 'Year': 'Y', 'Day': 'D'}
+REPORT_COLUMNS = ['Day', 'Company', 'Location HQ', 'Industry', 'Country', 'Stage', '# Laid Off', 'Source']
+REPORT_PAGE_SIZES = [25, 50, 100, 250]
+
+
+def time_series(cube, granularity, rows=None):
+    # Companies with layoffs and employees laid off per period code
+    if granularity == 'Day':
+        # Finer than the cube: aggregate the selected rows by day
+        series = rows.groupby('Day', observed=True).agg(**{
+            'Company': ('Company', 'count'),
+            '# Laid Off': ('# Laid Off', 'sum'),
+        }).reset_index()
+    else:
+        # The cube's Quarter key (Month // 3) is also the quarterly period ordinal
+        series = cube.rollup(granularity)
+    return series
+
+
+def time_layoff(cube, granularity='Month', rows=None):
+
+    # Only the selected granularity is computed and sent; switching is a rerun
+    series = time_series(cube, granularity, rows)
+    codes = series[granularity].to_numpy(dtype=np.int64)
+    freq = TIME_GRANULARITIES[granularity]
+
+    # Down to about one point per pixel, picking points by LTTB on the period codes
+    count_x, companies = decimate(codes, series['Company'].astype(float))
+    laid_x, laid_off = decimate(codes, series['# Laid Off'].astype(float))
+
     fig = go.Figure()
 
-    # Add line for Company
-    fig.add_trace(go.Bar(x=month['Month'], y=month['Company'], name='Companies with Layoffs',marker_color='rgba(254,206,186,255)',yaxis='y1'))
+    if len(codes) > DEFAULT_WEBGL_THRESHOLD:
+        # Too many periods for readable bars: WebGL area instead
+        fig.add_trace(line_trace(period_labels(count_x, freq), companies, name='Companies with Layoffs', mode='lines', fill='tozeroy', line_color='rgba(254,206,186,255)', yaxis='y1'))
+    else:
+        fig.add_trace(go.Bar(x=period_labels(count_x, freq), y=companies, name='Companies with Layoffs',marker_color='rgba(254,206,186,255)',yaxis='y1'))
     
     # Add line for # Laid Off
-    fig.add_trace(go.Scatter(x=month['Month'], y=month['# Laid Off'], name='Employees Laid Off', mode='lines',line_color='#67000d',yaxis='y2'))
+    fig.add_trace(line_trace(period_labels(laid_x, freq), laid_off, name='Employees Laid Off', mode='lines',line_color='#67000d',yaxis='y2'))
 
     # Set plot layout
     fig.update_layout(
@@ -194,7 +228,6 @@ def time_layoff(data):
         xaxis=dict(title=''),
         yaxis=dict(title='Companies with Layoffs'),
         yaxis2=dict(title='Employees Laid Off', side='right', overlaying='y', showgrid=False),
-        updatemenus=[dict(buttons=buttons)],
         legend=dict(orientation='h',
             yanchor="bottom",
             y=1,
@@ -205,29 +238,25 @@ def time_layoff(data):
 
     # Display the plot
     #fig.show()
-    st.plotly_chart(fig,use_container_width=True)
+    return fig
 
 
-def country_layoff(data,geo_json,title):
-    
-    geo_df = pd.DataFrame(geo_json['features'])
-    geo_df['Country'] = geo_df['properties'].apply(lambda x: x['name'])
+def country_layoff(cube,geo_index,title):
 
-    country_laid_off = data.groupby('Country').agg({'# Laid Off':'sum',
-                                                   'Company':'nunique'}).reset_index()
-    shutdown = data[data['%']==1].groupby('Country')['Company'].nunique().reset_index()
-    
-    country_laid_off = country_laid_off.merge(shutdown,on='Country',how='left').fillna(0)
+    country_laid_off = cube.rollup('Country', distinct=True)
+    country_laid_off = country_laid_off[['Country','# Laid Off','Total Companies','# Companies Shutdown']]
     
-    country_laid_off.columns = ['Country','# Laid Off','Total Companies','# Companies Shutdown']
-    
-    country_laid_off = geo_df.merge(country_laid_off,on='Country',how='left')
+    # Countries without a feature in the asset cannot be drawn
+    country_laid_off['id'] = country_laid_off['Country'].astype(str).map(geo_index)
+    country_laid_off = country_laid_off.dropna(subset=['id'])
+    # Plain floats: nullable Float64 NA values do not serialize in the figure JSON
+    country_laid_off['# Laid Off'] = country_laid_off['# Laid Off'].astype(float)
     country_laid_off['sqrt Laid Off'] = np.sqrt(country_laid_off['# Laid Off'])
     
     colorscale = ["#B4C0DC","#969BF4","#686FEF","#3A43EA"]
     
     fig = px.choropleth(country_laid_off,
-                       geojson=country_laid_off.geometry,
+                       geojson=GEOJSON_URL,
                        locations=country_laid_off.id,
                        color="sqrt Laid Off",
                        projection="equirectangular",
@@ -258,7 +287,7 @@ def country_layoff(data,geo_json,title):
 
     # Show the map
     #fig.show()
-    st.plotly_chart(fig,config={'scrollZoom': False},use_container_width=True)
+    return fig
 
 
 # ## Streamlit
@@ -282,7 +311,7 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-country_layoff(data,geo_json,"Across the World So Far")
+show_chart('country', (), lambda: country_layoff(cube,geo_index,"Across the World So Far"), config={'scrollZoom': False})
 
 
 # +
@@ -303,15 +332,28 @@ def centered_metric(label, value):
         </div>
     """, unsafe_allow_html=True)
 
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_headline_metrics_cached(_data, view_id: str, share_id: str, fetched_at: float):
+    # Filter-independent totals, scanned once per snapshot instead of on every rerun
+    return {
+        'reports': _data.shape[0],
+        'laid_off': str(int(_data['# Laid Off'].sum()/1000))+"K+",
+        'companies': int(_data['Company'].nunique()),
+        'shutdowns': int(_data[_data['%']==1]['Company'].nunique()),
+    }
+
+
+headline = get_headline_metrics_cached(data, target.view_id, target.share_id, snapshot_meta.get('fetched_at', 0))
 m1,m2,m3,m4,m5,m6 = st.columns([3,2,2,2,2,3])
 with m2:
-    centered_metric("Total Reports", data.shape[0])
+    centered_metric("Total Reports", headline['reports'])
 with m3:
-    centered_metric("Total Laid Off", str(int(data['# Laid Off'].sum()/1000))+"K+")
+    centered_metric("Total Laid Off", headline['laid_off'])
 with m4:
-    centered_metric("Total Companies", int(data['Company'].nunique()))
+    centered_metric("Total Companies", headline['companies'])
 with m5:
-    centered_metric("Companies Shutdown", int(data[data['%']==1]['Company'].nunique()))
+    centered_metric("Companies Shutdown", headline['shutdowns'])
 # -
 
 st.markdown(
@@ -325,200 +367,284 @@ st.markdown(
 )
 
 # +
-filter1, filter2, filter3, filter4 = st.columns(4)
-
-year_filter = filter1.selectbox("", ['Select Year (All)']+list(data['Year'].dropna().unique()))
-industry_filter = filter2.selectbox("", ['Select Industry (All)']+sorted(data['Industry'].dropna().astype(str).unique()))
-country_filter = filter3.selectbox("", ['Select Country (All)']+list(data['Country'].dropna().astype(str).unique()))
-company_filter = filter4.selectbox("", ['Select Company (All)']+list(data[data['# Laid Off'].notnull()]['Company'].astype(str).unique()))
-
-try:
-    # +
-    data['dum'] = True
-
-    mask = (data['dum'] == True)
-
-    # Update the mask based on the selected filters
-    if year_filter != 'Select Year (All)':
-        mask &= (data['Year'] == year_filter)
-    if industry_filter != 'Select Industry (All)':
-        mask &= (data['Industry'] == industry_filter)
-    if country_filter != 'Select Country (All)':
-        mask &= (data['Country'] == country_filter)
-    if company_filter != 'Select Company (All)':
-        mask &= (data['Company'] == company_filter)
-
-    # Filter the data DataFrame based on the selected filters
-    filtered_data = data[mask]
-
-
-    # -
-    def custom_metric(label, value, delta):
-        st.markdown(f"""
-            <div style="
-                background-color: #f8f9fa;
-                border: 1px solid #dee2e6;
-                border-radius: 12px;
-                padding: 15px;
-                text-align: center;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-                font-family: monospace;
-            ">
-                <div style="font-size: 24px; color: #212529;">{value}</div>
-                <div style="font-size: 16px; color: #e03131;">{delta}</div>
-                <div style="font-size: 16px; color: #6c757d;">{label}</div>
-            </div>
-        """, unsafe_allow_html=True)
-
-
-
-    def top_layoffs(data,n):
-        top = data[['Day','Company','# Laid Off']].dropna().sort_values(by=['# Laid Off'],ascending=False).head(n)
-        top = top.rename(columns={'# Laid Off': 'Laid_Off'})
-        top['Day'] = pd.to_datetime(top['Day']).dt.strftime('%b %Y')
-
-        for i in range(0, len(top), 5):
-            cols = st.columns(5)
-            for j in range(5):
-                if i + j < len(top):
-                    row = top.iloc[i + j]
-                    with cols[j]:
-                        custom_metric(
-                            label=row.Day,
-                            value=row.Company,
-                            delta=f"{int(row.Laid_Off):,} employees"
-                        )
-            st.markdown("<h6> </h6>", unsafe_allow_html=True)
-
-
-
-    #+
-    st.markdown("<h1> </h1>", unsafe_allow_html=True)
+# A fragment: its widgets (the filters, granularity and table controls) rerun
+# only this section, never the global map and headline metrics above
+@st.fragment
+def explore_section():
+    filter1, filter2, filter3, filter4 = st.columns(4)
+
+    year_counts = row_index.counts('Year')
+    industry_counts = row_index.counts('Industry')
+    country_counts = row_index.counts('Country')
+    company_counts = row_index.counts('Company', rows=row_index.measured_rows)
+
+    year_codes = {period_label(code, 'Y'): code for code in year_counts.index}
+    year_counts.index = list(year_codes)
+
+    def with_count(counts):
+        # Exact report counts from the inverted index next to each option
+        return lambda option: f"{option} ({counts[option]:,})" if option in counts.index else option
+
+    year_filter = filter1.selectbox("", ['Select Year (All)']+list(year_codes), format_func=with_count(year_counts))
+    industry_filter = filter2.selectbox("", ['Select Industry (All)']+sorted(industry_counts.index.astype(str)), format_func=with_count(industry_counts))
+    country_filter = filter3.selectbox("", ['Select Country (All)']+list(country_counts.index.astype(str)), format_func=with_count(country_counts))
+    company_filter = filter4.selectbox("", ['Select Company (All)']+list(company_counts.index.astype(str)))
+
+    try:
+        # +
+        filters = {}
+
+        # Collect the selected filters
+        if year_filter != 'Select Year (All)':
+            filters['Year'] = year_codes[year_filter]
+        if industry_filter != 'Select Industry (All)':
+            filters['Industry'] = industry_filter
+        if country_filter != 'Select Country (All)':
+            filters['Country'] = country_filter
+        if company_filter != 'Select Company (All)':
+            filters['Company'] = company_filter
+
+        # Intersect the posting lists of the selected values instead of scanning every row
+        with span("filter", filters=len(filters)) as s:
+            rows = row_index.select(filters)
+            filtered_data = data if rows is None else data.take(rows)
+            s.set(rows=len(filtered_data))
+
+        # Charts read from the pre-aggregated cube; Company is not a cube
+        # dimension, so a company selection aggregates its (few) rows instead.
+        # Only built when one of the figures below is not cached yet.
+        @functools.lru_cache(maxsize=1)
+        def filtered_cube():
+            if 'Company' in filters:
+                return AggregateCube.from_frame(filtered_data)
+            return cube.slice(
+                year=filters.get('Year'),
+                industry=filters.get('Industry'),
+                country=filters.get('Country'),
+            )
+
+        filter_key = (year_filter, industry_filter, country_filter, company_filter)
+
+
+        # -
+        def custom_metric(label, value, delta):
+            st.markdown(f"""
+                <div style="
+                    background-color: #f8f9fa;
+                    border: 1px solid #dee2e6;
+                    border-radius: 12px;
+                    padding: 15px;
+                    text-align: center;
+                    box-shadow: 0 2px 6px rgba(0,0,0,0.05);
+                    font-family: monospace;
+                ">
+                    <div style="font-size: 24px; color: #212529;">{value}</div>
+                    <div style="font-size: 16px; color: #e03131;">{delta}</div>
+                    <div style="font-size: 16px; color: #6c757d;">{label}</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+
+
+        def top_layoffs(rows,n):
+            # Partial selection over the snapshot's sort ranks instead of sorting the filtered rows
+            top = data[['Day','Company','# Laid Off']].take(sort_index.top('# Laid Off', n, rows, require=('Day', 'Company')))
+            top = top.rename(columns={'# Laid Off': 'Laid_Off'})
+            top['Day'] = period_labels(top['Day'], 'D', fmt='%b %Y')
+
+            for i in range(0, len(top), 5):
+                cols = st.columns(5)
+                for j in range(5):
+                    if i + j < len(top):
+                        row = top.iloc[i + j]
+                        with cols[j]:
+                            custom_metric(
+                                label=row.Day,
+                                value=row.Company,
+                                delta=f"{int(row.Laid_Off):,} employees"
+                            )
+                st.markdown("<h6> </h6>", unsafe_allow_html=True)
+
+
+
+        #+
+        st.markdown("<h1> </h1>", unsafe_allow_html=True)
     
-    st.markdown("<h3 style='text-align: center;'>Top Layoffs</h3>", unsafe_allow_html=True)
-    top_layoffs(filtered_data,10)
+        st.markdown("<h3 style='text-align: center;'>Top Layoffs</h3>", unsafe_allow_html=True)
+        top_layoffs(rows,10)
     
-    st.markdown("<h1> </h1>", unsafe_allow_html=True)
+        st.markdown("<h1> </h1>", unsafe_allow_html=True)
         
-    st.markdown("<h3 style='text-align: center;'>Layoffs over Time</h3>", unsafe_allow_html=True)
-    time_layoff(filtered_data)
+        st.markdown("<h3 style='text-align: center;'>Layoffs over Time</h3>", unsafe_allow_html=True)
+        granularity = st.radio('Granularity', list(TIME_GRANULARITIES), horizontal=True, label_visibility='collapsed')
+        show_chart(f'time.{granularity}', filter_key, lambda: time_layoff(filtered_cube(), granularity, filtered_data))
 
 
-    # -
+        # -
 
-    def industry_layoff(data):
-        industry_group = data.groupby('Industry')['# Laid Off'].sum().sort_values(ascending=False).reset_index()
+        def industry_layoff(cube):
+            industry_group = cube.rollup('Industry')[['Industry','# Laid Off']].sort_values('# Laid Off', ascending=False).reset_index(drop=True)
 
-        if len(industry_group[industry_group['Industry']!='Other'])>=8:
-            large_categories = industry_group[industry_group['Industry']!='Other'].head(8)
-            other_categories = industry_group[~industry_group['Industry'].isin(large_categories['Industry'].unique())]['# Laid Off'].sum()
-            large_categories.loc[len(large_categories)] = {'Industry': 'Other', '# Laid Off': other_categories}
+            if len(industry_group[industry_group['Industry']!='Other'])>=8:
+                large_categories = industry_group[industry_group['Industry']!='Other'].head(8)
+                other_categories = industry_group[~industry_group['Industry'].isin(large_categories['Industry'].unique())]['# Laid Off'].sum()
+                large_categories.loc[len(large_categories)] = {'Industry': 'Other', '# Laid Off': other_categories}
             
-        else:
-            large_categories = industry_group.copy()
+            else:
+                large_categories = industry_group.copy()
         
-        fig = px.pie(large_categories, values='# Laid Off', names='Industry',hole=0.6,
-                    color_discrete_sequence= px.colors.sequential.Reds_r)
+            fig = px.pie(large_categories, values='# Laid Off', names='Industry',hole=0.6,
+                        color_discrete_sequence= px.colors.sequential.Reds_r)
         
-#         fig.update_layout(
-#             title={
-#                 'text': 'Layoffs by Industry',
-#                 'x': 0.5,  # Set the title's horizontal alignment to the center
-#                 'font': {'size': 24, 'family': 'Monospace, bold'}
-#             }
-#         )
+    #         fig.update_layout(
+    #             title={
+    #                 'text': 'Layoffs by Industry',
+    #                 'x': 0.5,  # Set the title's horizontal alignment to the center
+    #                 'font': {'size': 24, 'family': 'Monospace, bold'}
+    #             }
+    #         )
         
-        # Display the chart
-        st.plotly_chart(fig,use_container_width=True)
+            # Display the chart
+            return fig
 
 
-    def stage_layoff(data):
-        stage_group = data.groupby('Stage')['# Laid Off'].sum().reset_index()
+        def stage_layoff(cube):
+            stage_group = cube.rollup('Stage')[['Stage','# Laid Off']]
 
-        if len(stage_group[stage_group['Stage']!='Other'])>=8:
-            large_categories = stage_group[stage_group['Stage']!='Other'].head(8)
-            other_categories = stage_group[~stage_group['Stage'].isin(large_categories['Stage'].unique())]['# Laid Off'].sum()
-            large_categories.loc[len(large_categories)] = {'Stage': 'Other', '# Laid Off': other_categories}
-        else:
-            large_categories = stage_group.copy()
+            if len(stage_group[stage_group['Stage']!='Other'])>=8:
+                large_categories = stage_group[stage_group['Stage']!='Other'].head(8)
+                other_categories = stage_group[~stage_group['Stage'].isin(large_categories['Stage'].unique())]['# Laid Off'].sum()
+                large_categories.loc[len(large_categories)] = {'Stage': 'Other', '# Laid Off': other_categories}
+            else:
+                large_categories = stage_group.copy()
         
-        fig = px.pie(large_categories, values='# Laid Off', names='Stage',hole=.6,
-                    color_discrete_sequence= px.colors.sequential.Reds_r)
+            fig = px.pie(large_categories, values='# Laid Off', names='Stage',hole=.6,
+                        color_discrete_sequence= px.colors.sequential.Reds_r)
         
-        fig.update_layout(
-#             title={
-#                 'text': 'Layoffs by Stage',
-#                 'x': 0.5,  # Set the title's horizontal alignment to the center
-#                 'font': {'size': 24, 'family': 'Monospace, bold'}
-#             }, 
-            legend_traceorder="reversed"
-        )
+            fig.update_layout(
+    #             title={
+    #                 'text': 'Layoffs by Stage',
+    #                 'x': 0.5,  # Set the title's horizontal alignment to the center
+    #                 'font': {'size': 24, 'family': 'Monospace, bold'}
+    #             }, 
+                legend_traceorder="reversed"
+            )
         
-        # Display the chart
-        st.plotly_chart(fig,use_container_width=True)
+            # Display the chart
+            return fig
 
 
-    # +
-    plot1, plot2 = st.columns(2)
+        # +
+        plot1, plot2 = st.columns(2)
 
-    with plot1:
-        st.markdown("<h3 style='text-align: center;'>Layoffs by Industry</h3>", unsafe_allow_html=True)
-        industry_layoff(filtered_data)
-    with plot2:
-        st.markdown("<h3 style='text-align: center;'>Layoffs by Company Stage</h3>", unsafe_allow_html=True)
-        stage_layoff(filtered_data)
+        with plot1:
+            st.markdown("<h3 style='text-align: center;'>Layoffs by Industry</h3>", unsafe_allow_html=True)
+            show_chart('industry', filter_key, lambda: industry_layoff(filtered_cube()))
+        with plot2:
+            st.markdown("<h3 style='text-align: center;'>Layoffs by Company Stage</h3>", unsafe_allow_html=True)
+            show_chart('stage', filter_key, lambda: stage_layoff(filtered_cube()))
 
 
-    # -
+        # -
 
-    def location_layoff(data):
+        def location_layoff(cube):
         
-#         data['City'] = data['Location HQ'].apply(lambda x:x[0]+" ("+x[1]+")" if len(x)>1 else x[0])
-        data['City'] = data['Location HQ'].dropna().apply(lambda x:x[0])
-        location_group  = data.groupby('City')['# Laid Off'].sum().reset_index().sort_values('# Laid Off').tail(10)
+            # City is the first Location HQ entry, see layoffs_index.first_locations
+            location_group = cube.rollup('City')[['City','# Laid Off']]
+            location_group = location_group.iloc[top_k(location_group['# Laid Off'].to_numpy(dtype=float, na_value=np.nan), 10)[::-1]]
         
-        fig = px.bar(location_group, y="City", x="# Laid Off",orientation='h')
+            fig = px.bar(location_group, y="City", x="# Laid Off",orientation='h')
         
-        fig.update_layout(
-#             title={
-#                 'text': 'Top 10 Cities with Layoffs',
-#                 'x': 0.5,  # Set the title's horizontal alignment to the center
-#                 'font': {'size': 24, 'family': 'Monospace, bold'}
-#             },
-            xaxis=dict(title=''),
-            yaxis=dict(title=''),
-            width=1500,
-            height=500,
-            margin=dict(l=0, r=0, t=40, b=0)
-        )
+            fig.update_layout(
+    #             title={
+    #                 'text': 'Top 10 Cities with Layoffs',
+    #                 'x': 0.5,  # Set the title's horizontal alignment to the center
+    #                 'font': {'size': 24, 'family': 'Monospace, bold'}
+    #             },
+                xaxis=dict(title=''),
+                yaxis=dict(title=''),
+                width=1500,
+                height=500,
+                margin=dict(l=0, r=0, t=40, b=0)
+            )
         
-        fig.update_traces(marker_color='rgba(254,206,186,255)')
+            fig.update_traces(marker_color='rgba(254,206,186,255)')
         
-        st.plotly_chart(fig,use_container_width=True)
-
-
-    # +
-    l1,l2 = st.columns(2)
-
-    with l1:
-        st.markdown("<h3 style='text-align: center;'>Layoffs by Country</h3>", unsafe_allow_html=True)
-        country_layoff(filtered_data,geo_json,"Layoffs by Country")
-    with l2:
-        st.markdown("<h3 style='text-align: center;'>Layoffs by Cities</h3>", unsafe_allow_html=True)
-        location_layoff(filtered_data)
-    # -
-
-    st.markdown(
-        """
-        <h3 style='text-align: center; font-size:24px;'>
-            LayOff Reports<br>
-        </h3>
-        """,
-        unsafe_allow_html=True
-    )
+            return fig
+
+
+        # +
+        l1,l2 = st.columns(2)
+
+        with l1:
+            st.markdown("<h3 style='text-align: center;'>Layoffs by Country</h3>", unsafe_allow_html=True)
+            show_chart('country', filter_key, lambda: country_layoff(filtered_cube(),geo_index,"Layoffs by Country"), config={'scrollZoom': False})
+        with l2:
+            st.markdown("<h3 style='text-align: center;'>Layoffs by Cities</h3>", unsafe_allow_html=True)
+            show_chart('location', filter_key, lambda: location_layoff(filtered_cube()))
+        # -
+
+        st.markdown(
+            """
+            <h3 style='text-align: center; font-size:24px;'>
+                LayOff Reports<br>
+            </h3>
+            """,
+            unsafe_allow_html=True
+        )
+
+        # Only the visible page is ordered, formatted and sent to the browser;
+        # sorting reuses the per-snapshot ranks instead of sorting the rows
+        r1, r2, r3, r4 = st.columns(4)
+        sort_by = r1.selectbox('Sort by', SORT_COLUMNS, index=0)
+        descending = r2.selectbox('Order', ['Descending', 'Ascending']) == 'Descending'
+        page_size = r3.selectbox('Rows per page', REPORT_PAGE_SIZES, index=1)
+        report_rows = np.arange(len(data)) if rows is None else rows
+        n_pages = max(1, -(-len(report_rows) // page_size))
+        page = r4.number_input(f'Page (of {n_pages})', min_value=1, max_value=n_pages, value=1, step=1,
+                               key=f'reports_page.{filter_key}.{page_size}')
+
+        with span("reports.page", rows=len(report_rows), page=page, page_size=page_size):
+            ordered = sort_index.order(sort_by, report_rows, ascending=not descending)
+            visible = ordered[(page - 1) * page_size:page * page_size]
+            reports = data[REPORT_COLUMNS].take(visible)
+            reports['Day'] = period_labels(reports['Day'], 'D')
+            reports['Location HQ'] = [', '.join(v) if isinstance(v, (list, np.ndarray)) else v for v in reports['Location HQ']]
+
+        st.caption(f"Rows {(page - 1) * page_size + min(1, len(visible))}–{(page - 1) * page_size + len(visible)} of {len(report_rows):,}")
+        st.dataframe(
+            reports,
+            use_container_width=True,
+            hide_index=True,
+            column_config={'Source': st.column_config.LinkColumn('Source')},
+        )
+
+    except Exception as e:
+        st.error(e)
+        st.error('Try another combination of filters')
 
-    st.dataframe(filtered_data[['Day','Company','Location HQ','Industry','Country','Stage','# Laid Off','Source']],use_container_width=True)
 
-except Exception as e:
-    st.error(e)
-    st.error('Try another combination of filters')
+explore_section()
+
+
+# +
+# Diagnostics, only for admins: open the app with ?admin=<LAYOFFS_ADMIN_TOKEN>
+ADMIN_TOKEN = load_admin_token()
+
+if ADMIN_TOKEN and st.query_params.get('admin') == ADMIN_TOKEN:
+    with st.expander("Diagnostics"):
+        d1, d2, d3, d4 = st.columns(4)
+        d1.metric("Snapshot age", f"{snapshot.age_s / 3600:.1f} h")
+        d2.metric("Rows", f"{len(data):,}")
+        d3.metric("Peak RSS", f"{peak_rss_mb() or 0:,.0f} MB")
+        d4.metric("Figure cache", f"{figure_cache.hits} hits / {figure_cache.misses} misses")
+        if refresher.last_error:
+            st.warning(f"Last refresh failed ({refresher.failures}x): {refresher.last_error}")
+        st.json({'snapshot': snapshot_meta, 'counters': counters()}, expanded=False)
+
+        totals = pd.DataFrame.from_dict(span_totals(), orient='index')
+        if len(totals):
+            totals['mean_wall_s'] = totals['wall_s'] / totals['count']
+            st.dataframe(totals.sort_values('wall_s', ascending=False), use_container_width=True)
+        st.dataframe(pd.DataFrame(recent_spans(100)[::-1]), use_container_width=True)
+# -
@@ -0,0 +1,41 @@
+import os
+import sys
+import copy
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layoffs_bench import generate_payload  # noqa: E402
+from layoffs_data import table_from_payload  # noqa: E402
+from layoffs_prep import build_dataset  # noqa: E402
+
+
+def edited_payload(payload: dict, seed: int = 0) -> dict:
+    """
+    A copy of `payload` with a few records changed, removed and added, the
+    way a refresh of the live table would see them.
+    """
+    payload = copy.deepcopy(payload)
+    rows = payload["data"]["table"]["rows"]
+    rows[5]["cellValuesByColumnId"]["fldLaidOff"] = 123456
+    rows[7]["cellValuesByColumnId"]["fldPercent"] = 1.0
+    rows[9]["cellValuesByColumnId"]["fldIndustry"] = "selI003"
+    del rows[10]
+    del rows[20]
+    for k in range(30):
+        row = copy.deepcopy(rows[k + seed])
+        row["id"] = f"recNEW{k:08d}"
+        row["cellValuesByColumnId"]["fldCompany"] = f"Brand New Company {k % 7}"
+        rows.append(row)
+    return payload
+
+
+@pytest.fixture(scope="session")
+def payload():
+    return generate_payload(2000, seed=1)
+
+
+@pytest.fixture(scope="session")
+def dataset(payload):
+    return build_dataset(table_from_payload(payload))
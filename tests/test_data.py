@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import threading
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+import requests
+
+import layoffs_data
+
+from layoffs_data import (
+    BrowserPool,
+    NotModified,
+    SnapshotRefresher,
+    Target,
+    Validators,
+    _content_hash,
+    _fetch_target,
+    _msgpack_variant,
+    _read_url_cache_file,
+    cache_read_url,
+    cached_read_url,
+    fetch_json,
+    fetch_table,
+    freeze_frame,
+    invalidate_read_url,
+    load_target_snapshot,
+    reload_target_snapshot,
+    save_snapshot,
+)
+
+
+def test_freeze_frame_blocks_writes_but_not_derived_frames(dataset):
+    data = freeze_frame(dataset.copy())
+    with pytest.raises(ValueError):
+        data["row_hash"].to_numpy()[0] = 0
+    with pytest.raises(ValueError):
+        data["# Laid Off"].array._data[0] = 0.0
+
+    with pd.option_context("mode.copy_on_write", True):
+        derived = data.take([0, 1])
+        derived["# Laid Off"] = 0.0
+    pd.testing.assert_series_equal(data["# Laid Off"], dataset["# Laid Off"])
+
+
+class _PayloadHandler(BaseHTTPRequestHandler):
+    body = b"{}"
+    # Answer to the msgpack variant of the URL: (status, body)
+    msgpack = (200, b"\xc1 not msgpack")
+    # Send an ETag and answer a matching If-None-Match with 304
+    etag = False
+    requests = []
+    statuses = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        status, body, content_type = 200, self.body, "application/json"
+        if "allowMsgpackOfResult=true" in self.path:
+            (status, body), content_type = self.msgpack, "application/x-msgpack"
+        etag = f'"{_content_hash(body)}"'
+        if self.etag and status == 200 and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.statuses.append(status)
+        self.send_response(status)
+        if self.etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def payload_server(payload):
+    _PayloadHandler.body = json.dumps(payload).encode("utf-8")
+    _PayloadHandler.msgpack = (200, b"\xc1 not msgpack")
+    _PayloadHandler.etag = False
+    _PayloadHandler.requests = []
+    _PayloadHandler.statuses = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PayloadHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v0.3/view/viwTest/readSharedViewData"
+    server.shutdown()
+
+
+def test_fetch_table_streams_and_records_the_content_hash(payload_server, payload):
+    validators = Validators()
+    table = fetch_table(payload_server, validators=validators)
+
+    assert len(table) == len(payload["data"]["table"]["rows"])
+    assert validators.content_hash == _content_hash(_PayloadHandler.body)
+    with pytest.raises(NotModified):
+        fetch_table(payload_server, validators=validators)
+    with pytest.raises(NotModified):
+        fetch_json(payload_server, validators=Validators(content_hash=validators.content_hash))
+
+
+def test_undecodable_msgpack_keeps_the_json_content_hash(payload_server):
+    validators = Validators()
+    data = fetch_json(payload_server, msgpack=True, validators=validators)
+
+    assert data["msg"] == "SUCCESS"
+    assert validators.content_hash == _content_hash(_PayloadHandler.body)
+    with pytest.raises(NotModified):
+        fetch_json(payload_server, msgpack=True, validators=validators)
+
+
+def test_msgpack_auth_errors_are_not_retried_as_json(payload_server):
+    _PayloadHandler.msgpack = (401, b"")
+    with pytest.raises(requests.HTTPError) as e:
+        fetch_json(payload_server, msgpack=True)
+
+    assert e.value.response.status_code == 401
+    assert len(_PayloadHandler.requests) == 1
+
+
+@pytest.mark.parametrize("msgpack", [False, True])
+def test_not_modified_responses_are_not_decoded(payload_server, payload, monkeypatch, msgpack):
+    _PayloadHandler.etag = True
+    if msgpack:
+        _PayloadHandler.msgpack = (200, pytest.importorskip("msgpack").packb(payload))
+    validators = Validators()
+    table = fetch_table(payload_server, msgpack=msgpack, validators=validators)
+    assert len(table) == len(payload["data"]["table"]["rows"]) and validators.etag
+
+    def decode(*args, **kwargs):
+        raise AssertionError("304 body decoded")
+
+    for name in ("stream_table", "table_from_payload", "_decode_msgpack"):
+        monkeypatch.setattr(layoffs_data, name, decode)
+    monkeypatch.setattr(requests.Response, "json", decode)
+    with pytest.raises(NotModified):
+        fetch_table(payload_server, msgpack=msgpack, validators=validators)
+    with pytest.raises(NotModified):
+        fetch_json(payload_server, msgpack=msgpack, validators=Validators(etag=validators.etag))
+    assert _PayloadHandler.statuses == [200, 304, 304]
+    assert all(("allowMsgpackOfResult=true" in path) == msgpack for path in _PayloadHandler.requests)
+
+
+def test_cold_start_refresh_failures_back_off():
+    calls = []
+
+    def refresh():
+        calls.append(time.time())
+        raise ConnectionError("layoffs.fyi is down")
+
+    refresher = SnapshotRefresher(refresh, interval_s=3600, retry_s=60)
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="layoffs.fyi is down"):
+            refresher.current()
+    assert len(calls) == 1 and refresher.failures == 1
+
+    refresher.next_refresh_at = 0.0  # backoff over
+    with pytest.raises(RuntimeError):
+        refresher.current()
+    assert len(calls) == 2 and refresher.failures == 2
+
+
+class _FakeBrowser:
+    def __init__(self, dead: bool = False):
+        self.dead = dead
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def new_context(self, **kwargs):
+        if self.dead:
+            raise RuntimeError("Target page, context or browser has been closed")
+        return self
+
+    async def close(self):
+        pass
+
+
+class _FakePlaywright:
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+def test_browser_pool_failed_relaunch_releases_once(monkeypatch):
+    launches = [_FakeBrowser(dead=True), RuntimeError("launch failed"), _FakeBrowser(), _FakeBrowser()]
+
+    async def launch(playwright):
+        browser = launches.pop(0)
+        if isinstance(browser, Exception):
+            raise browser
+        return browser
+
+    monkeypatch.setattr(layoffs_data, "_launch_chromium", launch)
+    monkeypatch.setattr(layoffs_data, "async_playwright", _FakePlaywright)
+    pool = BrowserPool(max_uses=1)
+
+    async def open_context():
+        async with pool.context() as context:
+            return context
+
+    try:
+        with pytest.raises(RuntimeError, match="launch failed"):
+            pool.run(open_context())
+        assert pool._active == 0
+        first = pool.run(open_context())
+        # max_uses reached and nothing active: recycled
+        assert pool.run(open_context()) is not first and pool._active == 0 and not launches
+    finally:
+        pool.close()
+
+
+def test_read_only_reload_keeps_an_unchanged_snapshot(dataset, tmp_path):
+    target = Target(view_id="viwTest", share_id="shrTest")
+    path = str(tmp_path / "snapshot.arrow")
+    save_snapshot(dataset.head(50), {"view_id": "viwTest", "share_id": "shrTest"}, path=path)
+
+    current = load_target_snapshot(target, path=path)
+    assert reload_target_snapshot(current, target, path=path) is current
+
+    later = time.time() + 60  # touched by `python -m layoffs_data refresh`
+    os.utime(path, (later, later))
+    reloaded = reload_target_snapshot(current, target, path=path)
+    assert reloaded is not current and reloaded.meta["checked_at"] == later
+    assert reload_target_snapshot(reloaded, target, path=path) is reloaded
+
+
+def _signed_url(expires_in_s: float, n: int = 0) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(seconds=expires_in_s)
+    policy = json.dumps({"allowedActions": [], "expires": expires.isoformat().replace("+00:00", "Z")})
+    return (
+        f"https://airtable.com/v0.3/view/viwTest/readSharedViewData?n={n}"
+        f"&accessPolicy={urllib.parse.quote(policy)}"
+    )
+
+
+@pytest.fixture
+def url_cache(monkeypatch, tmp_path):
+    # An empty in-memory cache and a cache file of the test's own
+    path = str(tmp_path / "read_urls.json")
+    monkeypatch.setattr(layoffs_data, "_url_cache", {})
+    monkeypatch.setenv("LAYOFFS_URL_CACHE_PATH", path)
+    return path
+
+
+def test_read_url_cache_expiry_margin_and_disk_fallback(url_cache, monkeypatch):
+    target = Target(view_id="viwTest", share_id="shrTest")
+    near, far = _signed_url(60), _signed_url(3600)
+
+    cache_read_url(target, far)
+    assert cached_read_url(target, margin_s=300) == far
+    monkeypatch.setattr(layoffs_data, "_url_cache", {})  # a new process
+    assert cached_read_url(target, margin_s=300) == far
+
+    cache_read_url(target, near)
+    assert cached_read_url(target, margin_s=300) is None
+    assert cached_read_url(target, margin_s=0) == near
+
+    invalidate_read_url(target)
+    assert cached_read_url(target, margin_s=0) is None
+    assert _read_url_cache_file(url_cache) == {}
+
+    cache_read_url(target, "https://airtable.com/v0.3/view/viwTest/readSharedViewData")  # no expiry
+    assert cached_read_url(target, margin_s=0) is None
+
+
+@pytest.mark.parametrize("status", [401, 403, 500])
+def test_fetch_target_rediscovers_rejected_read_urls(url_cache, monkeypatch, status):
+    target = Target(view_id="viwTest", share_id="shrTest")
+    stale, fresh = _signed_url(3600, n=1), _signed_url(3600, n=2)
+    cache_read_url(target, stale)
+    monkeypatch.setattr(layoffs_data, "get_browser_pool", lambda: None)
+    monkeypatch.setattr(layoffs_data, "discover_picked_url", lambda **kw: (fresh, [fresh], None))
+
+    fetched = []
+
+    def fetch(read_url, msgpack=False, validators=None):
+        fetched.append(read_url)
+        if read_url == stale:
+            response = requests.Response()
+            response.status_code = status
+            raise requests.HTTPError(response=response)
+        return {"data": {"table": {"rows": []}}}
+
+    if status == 500:
+        with pytest.raises(requests.HTTPError):
+            _fetch_target(fetch, "https://layoffs.fyi", target, margin_s=300, settle_ms=0, log=None)
+        assert fetched == [stale] and cached_read_url(target) == stale
+        return
+
+    read_url, _ = _fetch_target(fetch, "https://layoffs.fyi", target, margin_s=300, settle_ms=0, log=None)
+    assert read_url == fresh and fetched == [stale, fresh]
+    assert cached_read_url(target) == fresh
+    assert _read_url_cache_file(url_cache) == {"viwTest/shrTest": fresh}
+
+
+def test_msgpack_variant_prefers_the_captured_url(url_cache, monkeypatch):
+    monkeypatch.setattr(layoffs_data, "_msgpack_urls", {})
+    target = Target(view_id="viwTest", share_id="shrTest")
+    nested = "&stringifiedObjectParams=" + urllib.parse.quote('{"shouldUseNestedResponseFormat":true}')
+    read_url = _signed_url(3600, n=1) + nested
+    edited = read_url + "&allowMsgpackOfResult=true"
+    captured = _signed_url(3600, n=2) + nested + "&allowMsgpackOfResult=true"
+    expires_sooner = _signed_url(60, n=3) + nested + "&allowMsgpackOfResult=true"
+
+    cache_read_url(target, read_url, matches=[read_url, expires_sooner])
+    assert _msgpack_variant(read_url) == edited
+    cache_read_url(target, read_url, matches=[read_url, expires_sooner, captured])
+    assert _msgpack_variant(read_url) == captured
+
+    invalidate_read_url(target)
+    assert _msgpack_variant(read_url) == edited
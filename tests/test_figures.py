@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import layoffs_figures
+from layoffs_figures import decimate, lttb
+
+
+def _charts_app():
+    import plotly.express as px
+    import plotly.io as pio
+    import streamlit as st
+
+    from layoffs_figures import plotly_chart_json
+
+    fig = px.bar(x=[1, 2, 3], y=[3, 1, 2])
+    st.plotly_chart(fig, use_container_width=True, config={"scrollZoom": False})
+    plotly_chart_json(pio.to_json(fig, validate=False), use_container_width=True, config={"scrollZoom": False})
+
+
+@pytest.mark.parametrize("listed", [True, False])
+def test_plotly_chart_json_matches_plotly_chart(monkeypatch, listed):
+    if not listed:
+        monkeypatch.setattr(layoffs_figures, "_PLOTLY_PROTO_VERSIONS", set())
+    at = AppTest.from_function(_charts_app).run()
+
+    assert not at.exception
+    expected, chart = at.get("plotly_chart")
+    if listed:
+        assert chart.proto == expected.proto
+    else:
+        # Rebuilt by st.plotly_chart: the same figure, not necessarily the same bytes
+        assert json.loads(chart.proto.spec) == json.loads(expected.proto.spec)
+
+
+def _reference_lttb(x, y, n_out):
+    # Plain transcription of Steinarsson's LTTB, one point at a time
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    a, out = 0, [0]
+    for i in range(n_out - 2):
+        avg_start, avg_end = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        out.append(a)
+    return out + [n - 1]
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 5), (1000, 100), (5000, 1500), (1501, 1500)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.choice(10 * n, n, replace=False)).astype(float)
+    y = rng.normal(size=n).cumsum()
+    assert lttb(x, y, n_out).tolist() == _reference_lttb(x.tolist(), y.tolist(), n_out)
+
+
+def test_decimate_keeps_short_series_and_caps_long_ones():
+    x, y = np.arange(100), np.arange(100.0)
+    assert decimate(x, y, max_points=200)[0] is x
+    labels, values = decimate(np.array([f"p{i}" for i in range(5000)]), np.ones(5000), max_points=300, x_numeric=np.arange(5000))
+    assert len(labels) == len(values) == 300 and labels[0] == "p0" and labels[-1] == "p4999"
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import edited_payload
+from layoffs_data import table_from_payload
+from layoffs_index import (
+    FILTER_DIMENSIONS,
+    SORT_COLUMNS,
+    AggregateCube,
+    InvertedIndex,
+    SortIndex,
+    first_locations,
+    top_k,
+)
+from layoffs_prep import build_dataset, changed_rows, update_dataset
+
+ROLLUP_DIMENSIONS = ("Year", "Quarter", "Month", "Industry", "Country", "Stage", "City")
+
+
+def _rollup(cube: AggregateCube, dim: str) -> pd.DataFrame:
+    out = cube.rollup(dim, distinct=True)
+    out[dim] = out[dim].astype(str)
+    return out.sort_values(dim).reset_index(drop=True).astype({c: float for c in out.columns if c != dim})
+
+
+def assert_same_rollups(cube: AggregateCube, expected: AggregateCube) -> None:
+    for dim in ROLLUP_DIMENSIONS:
+        pd.testing.assert_frame_equal(_rollup(cube, dim), _rollup(expected, dim), obj=dim)
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True])
+def test_apply_delta_matches_rebuild(payload, dataset, copy_on_write):
+    table = table_from_payload(edited_payload(payload))
+    with pd.option_context("mode.copy_on_write", copy_on_write):
+        data, _ = update_dataset(dataset, table)
+        removed, added = changed_rows(dataset, data)
+        cube = AggregateCube.from_frame(dataset).apply_delta(dataset[removed], data[added])
+        assert_same_rollups(cube, AggregateCube.from_frame(build_dataset(table)))
+
+
+def _expected_rollup(data: pd.DataFrame, dim: str) -> pd.DataFrame:
+    # The same totals straight from the rows
+    data = data.assign(City=first_locations(data["Location HQ"]), shutdown=data["%"].eq(1).fillna(False))
+    grouped = data.groupby(dim, observed=True)
+    out = grouped.agg(**{
+        "# Laid Off": ("# Laid Off", "sum"),
+        "Company": ("Company", "count"),
+        "Reports": ("Company", "size"),
+        "Total Companies": ("Company", "nunique"),
+    })
+    shutdowns = data[data["shutdown"]].groupby(dim, observed=True)["Company"].nunique()
+    out["# Companies Shutdown"] = shutdowns.reindex(out.index, fill_value=0)
+    out = out.reset_index()
+    out[dim] = out[dim].astype(str)
+    return out.sort_values(dim).reset_index(drop=True).astype({c: float for c in out.columns if c != dim})
+
+
+@pytest.mark.parametrize("dim", ROLLUP_DIMENSIONS)
+def test_rollup_matches_rows(dataset, dim):
+    pd.testing.assert_frame_equal(_rollup(AggregateCube.from_frame(dataset), dim), _expected_rollup(dataset, dim))
+
+
+def test_slice_matches_filtered_rows(dataset):
+    cube = AggregateCube.from_frame(dataset)
+    year, industry, country = dataset["Year"].iloc[0], dataset["Industry"].iloc[0], dataset["Country"].iloc[0]
+    for selection in ({"year": year}, {"industry": industry}, {"year": year, "country": country}):
+        mask = pd.Series(True, index=dataset.index)
+        for dim, value in selection.items():
+            mask &= dataset[dim.capitalize()].eq(value).fillna(False)
+        for dim in ("Quarter", "Stage", "City"):
+            pd.testing.assert_frame_equal(
+                _rollup(cube.slice(**selection), dim), _expected_rollup(dataset[mask], dim), obj=f"{selection} {dim}"
+            )
+
+
+def _sorted_values(values: pd.Series, ascending: bool) -> list:
+    # Nulls last either way; categories by label
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    present = values.dropna().sort_values(ascending=ascending, kind="stable")
+    return [str(v) for v in present] + ["<NA>"] * int(values.isna().sum())
+
+
+@pytest.mark.parametrize("col", SORT_COLUMNS)
+@pytest.mark.parametrize("ascending", [True, False])
+def test_sort_index_order_matches_sort(dataset, col, ascending):
+    sort_index = SortIndex.from_frame(dataset)
+    rows = np.flatnonzero(dataset["Industry"].eq(dataset["Industry"].iloc[0]).fillna(False).to_numpy())
+
+    for subset in (None, rows):
+        positions = sort_index.order(col, subset, ascending=ascending)
+        values = dataset[col].take(positions)
+        expected = dataset[col] if subset is None else dataset[col].take(subset)
+        assert [("<NA>" if pd.isna(v) else str(v)) for v in values.astype(object)] == _sorted_values(expected, ascending)
+
+
+def _counts(values: pd.Series) -> list:
+    # (value, rows) in first-appearance order, missing values left out
+    values = values.dropna().astype(object)
+    return list(values.value_counts(sort=False).reindex(pd.unique(values)).items())
+
+
+def test_inverted_index_matches_masks(dataset):
+    data = dataset.copy()
+    data.loc[data.index[::17], "Industry"] = np.nan
+    data.loc[data.index[::23], "Country"] = np.nan
+    row_index = InvertedIndex.from_frame(data)
+    rng = np.random.default_rng(0)
+
+    for _ in range(50):
+        dims = rng.choice(FILTER_DIMENSIONS, size=rng.integers(1, len(FILTER_DIMENSIONS) + 1), replace=False)
+        # Values of one row, so the filters always match something
+        row = data.iloc[rng.integers(len(data))]
+        filters = {dim: row[dim] for dim in dims if pd.notna(row[dim])}
+        if not filters:
+            continue
+        mask = np.ones(len(data), dtype=bool)
+        for dim, value in filters.items():
+            mask &= data[dim].eq(value).fillna(False).to_numpy()
+        rows = row_index.select(filters)
+        assert len(rows) and rows.tolist() == np.flatnonzero(mask).tolist()
+
+        measured = np.intersect1d(rows, row_index.measured_rows)
+        assert measured.tolist() == np.flatnonzero(mask & data["# Laid Off"].notna().to_numpy()).tolist()
+        for dim in FILTER_DIMENSIONS:
+            for subset in (rows, measured):
+                counts = row_index.counts(dim, rows=subset)
+                assert list(zip(counts.index.astype(object), counts)) == _counts(data[dim].take(subset))
+
+    assert row_index.select({}) is None
+    for dim in FILTER_DIMENSIONS:
+        counts = row_index.counts(dim)
+        assert list(zip(counts.index.astype(object), counts)) == _counts(data[dim])
+        counts = row_index.counts(dim, rows=row_index.measured_rows)
+        assert list(zip(counts.index.astype(object), counts)) == _counts(data[dim][data["# Laid Off"].notna()])
+
+
+@pytest.mark.parametrize("k", [0, 1, 10, 5000])
+def test_sort_index_top_matches_full_sort(dataset, k):
+    sort_index = SortIndex.from_frame(dataset)
+    rows = np.flatnonzero(dataset["Country"].eq(dataset["Country"].iloc[0]).fillna(False).to_numpy())
+
+    for subset in (None, rows):
+        data = dataset if subset is None else dataset.take(subset)
+        expected = data[["Day", "Company", "# Laid Off"]].dropna()["# Laid Off"]
+        expected = expected.sort_values(ascending=False, kind="stable").head(k).tolist()
+        positions = sort_index.top("# Laid Off", k, subset, require=("Day", "Company"))
+        assert dataset["# Laid Off"].take(positions).tolist() == expected
+
+
+def test_top_k_skips_nan_and_orders_largest_first():
+    values = np.array([3.0, np.nan, 5.0, 1.0, 5.0, 4.0])
+    assert top_k(values, 3).tolist() == [2, 4, 5]
+    assert top_k(values, 10).tolist() == [2, 4, 5, 0, 3]
+    assert top_k(values, 0).tolist() == []
@@ -0,0 +1,114 @@
+import os
+import copy
+
+import pandas as pd
+
+from conftest import edited_payload
+from layoffs_data import Target, load_or_refresh_snapshot, table_from_payload
+import layoffs_data
+from layoffs_index import AggregateCube
+from layoffs_prep import CATEGORY_COLUMNS, build_dataset, changed_rows, refresh_cube, update_dataset
+
+
+def _comparable(data: pd.DataFrame) -> pd.DataFrame:
+    # Category sets may differ (an update keeps the categories of removed rows)
+    data = data.copy()
+    for col in CATEGORY_COLUMNS:
+        data[col] = data[col].astype(object)
+    data["Location HQ"] = data["Location HQ"].map(lambda v: tuple(v) if isinstance(v, list) else v)
+    return data
+
+
+def test_update_dataset_matches_rebuild(payload, dataset):
+    table = table_from_payload(edited_payload(payload))
+    data, delta = update_dataset(dataset, table)
+
+    assert delta.as_dict() == {"added": 30, "changed": 3, "removed": 2}
+    pd.testing.assert_frame_equal(_comparable(data), _comparable(build_dataset(table)))
+
+    removed, added = changed_rows(dataset, data)
+    assert (removed.sum(), added.sum()) == (5, 33)
+
+
+def test_update_dataset_without_changes_returns_previous(payload, dataset):
+    data, delta = update_dataset(dataset, table_from_payload(payload))
+    assert data is dataset and not delta
+
+
+def _renamed_payload(payload: dict) -> dict:
+    # Retail renamed, plus one new row so the refresh has something to process
+    renamed = copy.deepcopy(payload)
+    columns = renamed["data"]["table"]["columns"]
+    industry = next(c for c in columns if c["name"] == "Industry")
+    industry["typeOptions"]["choices"]["selI000"]["name"] = "Retail & E-commerce"
+    rows = renamed["data"]["table"]["rows"]
+    rows.append({**copy.deepcopy(rows[0]), "id": "recRENAMED"})
+    return renamed
+
+
+def test_schema_change_rebuilds_instead_of_updating(payload, monkeypatch, tmp_path):
+    renamed = _renamed_payload(payload)
+    tables = iter([table_from_payload(payload), table_from_payload(renamed)])
+    monkeypatch.setattr(layoffs_data, "fetch_target_table", lambda *a, **kw: ("https://example.com", next(tables)))
+    monkeypatch.setattr(layoffs_data, "get_dataset_cache", lambda: None)
+
+    target = Target(view_id="viwTest", share_id="shrTest")
+    path = str(tmp_path / "snapshot.arrow")
+    for _ in range(2):
+        snapshot = load_or_refresh_snapshot(
+            "https://example.com", target, process=build_dataset, update=update_dataset, path=path, max_age_s=0,
+        )
+
+    assert "delta" not in snapshot.meta
+    expected = build_dataset(table_from_payload(renamed))["Industry"].value_counts()
+    pd.testing.assert_series_equal(snapshot.frame["Industry"].value_counts(), expected)
+    assert "Retail" not in set(snapshot.frame["Industry"].astype(object))
+
+
+def test_refresh_cube_applies_only_deltas_of_its_own_data(payload, monkeypatch, tmp_path):
+    edited = edited_payload(payload)
+    payloads = [payload, edited, _renamed_payload(edited)]
+    tables = iter([table_from_payload(p) for p in payloads])
+    monkeypatch.setattr(layoffs_data, "fetch_target_table", lambda *a, **kw: ("https://example.com", next(tables)))
+    monkeypatch.setattr(layoffs_data, "get_dataset_cache", lambda: None)
+
+    target = Target(view_id="viwTest", share_id="shrTest")
+    path = str(tmp_path / "snapshot.arrow")
+    cube = previous = fetched_at = None
+    for updated in (False, True, False):
+        snapshot = load_or_refresh_snapshot(
+            "https://example.com", target, process=build_dataset, update=update_dataset, path=path, max_age_s=0,
+        )
+        assert ("delta" in snapshot.meta) == updated
+        cube = refresh_cube(cube, previous, snapshot.frame, snapshot.meta, fetched_at)
+        previous, fetched_at = snapshot.frame, snapshot.meta["fetched_at"]
+
+        expected = AggregateCube.from_frame(snapshot.frame).rollup("Industry").set_index("Industry")
+        rollup = cube.rollup("Industry").set_index("Industry").reindex(expected.index)
+        pd.testing.assert_frame_equal(rollup, expected, check_dtype=False, check_index_type=False)
+    assert "Retail" not in set(cube.rollup("Industry")["Industry"].astype(object))
+
+
+def test_snapshot_links_the_dataset_cache_entry_it_was_built_with(payload, monkeypatch, tmp_path):
+    cache = layoffs_data.DatasetCache(root=str(tmp_path / "datasets"))
+
+    def fetch(*args, validators=None, **kwargs):
+        validators.content_hash = "payload-hash"
+        return "https://example.com", table_from_payload(payload)
+
+    monkeypatch.setattr(layoffs_data, "fetch_target_table", fetch)
+    monkeypatch.setattr(layoffs_data, "get_dataset_cache", lambda: cache)
+
+    target = Target(view_id="viwTest", share_id="shrTest")
+    path = str(tmp_path / "snapshot.arrow")
+    snapshot = load_or_refresh_snapshot("https://example.com", target, process=build_dataset, path=path, max_age_s=0)
+    entry = cache._path(snapshot.meta["dataset_key"])
+    assert os.path.samefile(path, entry)
+    stored = layoffs_data.load_snapshot(path).meta
+    assert {k: v for k, v in stored.items() if k != "checked_at"} == snapshot.meta
+
+    # A cache hit carries the meta of its first build: the snapshot is written anew
+    snapshot = load_or_refresh_snapshot("https://example.com", target, process=build_dataset, path=path, max_age_s=0)
+    assert not os.path.samefile(path, entry)
+    assert layoffs_data.load_snapshot(path).meta["fetched_at"] == snapshot.meta["fetched_at"]
+    pd.testing.assert_frame_equal(layoffs_data.load_snapshot(path).frame, build_dataset(table_from_payload(payload)))